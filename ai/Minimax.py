@@ -1,14 +1,104 @@
-import copy
+import concurrent.futures
+import multiprocessing
+import logging
 import random
+import time
+from ai.transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+logger = logging.getLogger(__name__)
+
+# For each pawn type, type mask of the stack it must land on to extend the 4-3-2-1 chain (4, 4-3 or 4-3-2)
+CHAIN_BELOW = (0, 0b1110, 0b1100, 0b1000, 0)
+
+# Order in which the moves are searched: stacking moves extending the chain, other stacking moves,
+# killer moves, then the quiet moves sorted by their history score
+ORDER_CHAIN = 3
+ORDER_STACK = 2
+ORDER_KILLER = 1
+ORDER_QUIET = 0
+
+
+# Raised inside the search when the time or node budget of the move is spent
+class SearchTimeout(Exception):
+    pass
+
+
+# Best root score found so far by the processes of the pool, shared between them, and the searcher of the process,
+# kept with its transposition table and history scores for all the searches (set by _init_worker)
+_shared_best = None
+_searcher = None
+
+
+def _init_worker(shared_best, color, tt_size_mb, tt_replacement):
+    global _shared_best, _searcher
+    _shared_best = shared_best
+    _searcher = Minimax(color, None, tt_size_mb, tt_replacement)
+
+
+# Score root moves in a process of the pool, the game is sent once for all of them. The search of each move is cut
+# with the best root score already found by the other processes, so a move that can't beat it gets an upper bound
+# like in the serial search
+def _search_root_moves(game, moves, max_depth):
+    ai = _searcher
+    ai.game = game
+    ai.nodes = 0
+    ai.cutoffs = 0
+    ai.killers = {}
+    for key in ai.history:
+        ai.history[key] //= 2
+    scores = []
+    for move in moves:
+        token = game.apply_move(move)
+        try:
+            score = ai.minimax(game, 1, max_depth, False, _shared_best.value, float('inf'), move)
+        finally:
+            game.undo_move(token)
+        with _shared_best.get_lock():
+            if score > _shared_best.value:
+                _shared_best.value = score
+        scores.append(score)
+    return scores, ai.nodes, ai.cutoffs
+
 
 class Minimax:
-    def __init__(self, color, game):
+    def __init__(self, color, game, tt_size_mb=16, tt_replacement="depth", time_budget=None, node_budget=None,
+                 max_depth=12, workers=1):
+        """
+        :param time_budget: seconds allowed per move, the search then deepens until the budget is spent
+        :param node_budget: nodes allowed per move, same as time_budget but reproducible
+        :param max_depth:   deepest search when a budget is given (base_depth is used when there is no budget)
+        :param workers:     processes searching the root moves at base_depth, 1 to search in this process
+                            (the search with a budget always runs in this process)
+        """
         self.type = "M"
         self.color = color
         self.game = game
         self.base_depth = self.set_base_depth_by_color(color)
         self.moves_scores = {} 
-        self.ispawnmoved = [False, False]
+        # Positions already searched, kept between the calls to playsmart (None to disable it)
+        self.tt = TranspositionTable(tt_size_mb, tt_replacement) if tt_size_mb else None
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.max_depth = max_depth
+        # Search statistics of the last call to playsmart (nodes searched and beta cutoffs)
+        self.nodes = 0
+        self.cutoffs = 0
+        self.last_depth = 0
+        # Quiet moves that caused a cutoff, per depth (reset on each call to playsmart)
+        self.killers = {}
+        # Score of the quiet moves that caused cutoffs, kept between the calls to playsmart
+        self.history = {}
+        # Set while the search can be stopped
+        self.deadline = None
+        self.node_limit = None
+        # Scores of the root moves at the previous depth, used to search the best ones first
+        self.root_scores = None
+        # Process pool of the parallel search, created on the first search
+        self.workers = workers
+        self.tt_size_mb = tt_size_mb
+        self.tt_replacement = tt_replacement
+        self.pool = None
+        self.shared_best = None
 
 
     def set_base_depth_by_color(self, color):
@@ -17,41 +107,123 @@ class Minimax:
         elif color == "orange":
             return 4
 
+    # Rank of a move in the search order (see ORDER_*), the biggest is searched first
+    def move_order(self, cells, move, killers):
+        _, type, x, y = move
+        target = cells[y * 5 + x] & 15
+        if target:
+            if target == CHAIN_BELOW[type]:
+                return (ORDER_CHAIN, 4 - type)
+            return (ORDER_STACK, 0)
+        if move in killers:
+            return (ORDER_KILLER, 0)
+        return (ORDER_QUIET, self.history.get(tuple(move), 0))
+
+    # Yield the moves of a player, starting with the best move found the last time the position was searched
+    # then following the move order. At the root, the moves are sorted by their score at the previous depth of
+    # the iterative deepening
+    def ordered_moves(self, game, color, first_move=None, depth=0):
+        if depth == 0 and self.root_scores:
+            moves = game.all_next_moves(color)
+            moves.sort(key=lambda move: self.root_scores.get(tuple(move), float('-inf')), reverse=True)
+            yield from moves
+            return
+        if first_move is not None:
+            first_move = list(first_move)
+            yield first_move
+        cells = game.grid.board.cells
+        killers = self.killers.get(depth, ())
+        moves = [move for move in game.iter_next_moves(color) if move != first_move]
+        moves.sort(key=lambda move: self.move_order(cells, move, killers), reverse=True)
+        yield from moves
+
+    # Remember a quiet move that caused a cutoff (killer move of its depth and history score)
+    def record_cutoff(self, game, move, depth, max_depth):
+        self.cutoffs += 1
+        if game.grid.board.top(move[2], move[3]) != 0:
+            return
+        killers = self.killers.setdefault(depth, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        key = tuple(move)
+        self.history[key] = self.history.get(key, 0) + (max_depth - depth) ** 2
+
+    # Alpha-beta search walking the game in place: each move is applied then undone
     def minimax(self, game, depth, max_depth, is_maximizing, alpha=float('-inf'), beta=float('inf'), move=None):
-        if self.color == "blue":
-            if depth == max_depth or self.ispawnmoved[1]:
-                return game.evaluateClassic(self.color)
-        if self.color == "orange":
-            if depth == max_depth or self.ispawnmoved[1]:
-                return game.evaluateClassic(self.color)
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 255 == 0 and time.monotonic() > self.deadline:
+            raise SearchTimeout()
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchTimeout()
+
+        if depth == max_depth or (move is not None and game.is_winning_stack(move[2], move[3])):
+            return game.evaluateClassic(self.color)
+
+        # Look for the position in the transposition table, the root is always searched to score every move
+        tt_move = None
+        if self.tt is not None:
+            key = game.position_hash()
+            entry = self.tt.probe(key)
+            if entry is not None:
+                _, entry_depth, flag, score, tt_move = entry
+                if depth > 0 and entry_depth >= max_depth - depth:
+                    if flag == EXACT:
+                        return score
+                    if flag == LOWER:
+                        alpha = max(alpha, score)
+                    else:
+                        beta = min(beta, score)
+                    if beta <= alpha:
+                        return score
+        alpha_orig, beta_orig = alpha, beta
+        best_move = None
 
         if is_maximizing:
             max_eval = float('-inf')
-            for next_move in game.all_next_moves(self.color):
-                simulated_game = copy.deepcopy(game)
-                color, piece_type, x, y = next_move
-                self.ispawnmoved = simulated_game.simulate_move(color, piece_type, x, y)
-                eval = self.minimax(simulated_game, depth + 1, max_depth, False, alpha, beta, next_move)
+            for next_move in self.ordered_moves(game, self.color, tt_move, depth):
+                token = game.apply_move(next_move)
+                try:
+                    eval = self.minimax(game, depth + 1, max_depth, False, alpha, beta, next_move)
+                finally:
+                    game.undo_move(token)
                 if depth == 0:  # Enregistrement à la racine
                     self.moves_scores[tuple(next_move)] = eval
+                if eval > max_eval or best_move is None:
+                    best_move = next_move
                 max_eval = max(max_eval, eval)
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    self.record_cutoff(game, next_move, depth, max_depth)
                     break
-            return max_eval
+            best_eval = max_eval
         else:
             min_eval = float('inf')
             opponent_color = "orange" if self.color == "blue" else "blue"
-            for next_move in game.all_next_moves(opponent_color):
-                simulated_game = copy.deepcopy(game)
-                color, piece_type, x, y = next_move
-                simulated_game.simulate_move(color, piece_type, x, y)
-                eval = self.minimax(simulated_game, depth + 1, max_depth, True, alpha, beta, next_move)
+            for next_move in self.ordered_moves(game, opponent_color, tt_move, depth):
+                token = game.apply_move(next_move)
+                try:
+                    eval = self.minimax(game, depth + 1, max_depth, True, alpha, beta, next_move)
+                finally:
+                    game.undo_move(token)
+                if eval < min_eval or best_move is None:
+                    best_move = next_move
                 min_eval = min(min_eval, eval)
                 beta = min(beta, eval)
                 if beta <= alpha:
+                    self.record_cutoff(game, next_move, depth, max_depth)
                     break
-            return min_eval
+            best_eval = min_eval
+
+        if self.tt is not None:
+            if best_eval <= alpha_orig:
+                flag = UPPER
+            elif best_eval >= beta_orig:
+                flag = LOWER
+            else:
+                flag = EXACT
+            self.tt.store(key, max_depth - depth, flag, best_eval, tuple(best_move) if best_move else None)
+        return best_eval
 
     def choose_best_move(self):
         if self.moves_scores:
@@ -59,21 +231,104 @@ class Minimax:
             best_moves = [move for move, score in self.moves_scores.items() if score == max_score]
             # Choisir aléatoirement parmi les meilleurs coups si plusieurs ont le même score
             best_move = random.choice(best_moves)
-            print("Best move chosen randomly from top scoring moves:", best_move)
+            logger.debug("Best move chosen randomly from top scoring moves: %s", best_move)
             return list(best_move)
         else:
-            print("No valid moves found, returning default move.")
+            logger.info("No valid moves found, returning default move.")
             all_moves = self.game.all_next_moves(self.color)
             if all_moves:
                 return random.choice(all_moves)  # Choisir un coup aléatoire parmi tous les coups possibles
             else:
                 return [self.color, -1, -1, -1]
 
-    def playsmart(self):
-        self.moves_scores = {}
-        self.minimax(self.game, 0, self.base_depth, True)
-        return self.choose_best_move()
+    # Search deeper and deeper until the budget is spent, the moves are scored by the last depth fully searched
+    def iterative_deepening(self, time_budget=None, node_budget=None):
+        start = time.monotonic()
+        scores = {}
+        self.root_scores = None
+        try:
+            for depth in range(1, self.max_depth + 1):
+                # The first depth is always searched to the end so that there is a move to play
+                if depth > 1:
+                    self.deadline = start + time_budget if time_budget is not None else None
+                    self.node_limit = node_budget
+                self.moves_scores = {}
+                try:
+                    self.minimax(self.game, 0, depth, True)
+                except SearchTimeout:
+                    break
+                scores = self.moves_scores
+                self.root_scores = scores
+                self.last_depth = depth
+                if time_budget is not None and time.monotonic() - start >= time_budget:
+                    break
+        finally:
+            self.deadline = None
+            self.node_limit = None
+            self.root_scores = None
+        self.moves_scores = scores
 
+    # Split the root moves between the processes of the pool, each one searching its share in a copy of the game
+    def parallel_search(self, max_depth):
+        if self.pool is None:
+            self.shared_best = multiprocessing.Value('d', float('-inf'))
+            self.pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker,
+                initargs=(self.shared_best, self.color, self.tt_size_mb, self.tt_replacement))
+        with self.shared_best.get_lock():
+            self.shared_best.value = float('-inf')
+        game = self.game.search_copy()
+        # The moves are dealt in search order, so that every process starts with a stacking move that gives the
+        # others a good bound to cut their search
+        moves = list(self.ordered_moves(self.game, self.color))
+        shares = [moves[i::self.workers] for i in range(self.workers) if moves[i::self.workers]]
+        futures = [self.pool.submit(_search_root_moves, game, share, max_depth) for share in shares]
+        self.nodes += 1
+        for share, future in zip(shares, futures):
+            scores, nodes, cutoffs = future.result()
+            for move, score in zip(share, scores):
+                self.moves_scores[tuple(move)] = score
+            self.nodes += nodes
+            self.cutoffs += cutoffs
 
+    # Stop the processes of the parallel search
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+            self.shared_best = None
 
-    
\ No newline at end of file
+    # Choose a move in each of several games (the transposition table and the history scores are shared between
+    # the games), so that one opponent can play for all the games of a vector env
+    def playsmart_batch(self, games, time_budget=None, node_budget=None):
+        previous_game = self.game
+        moves = []
+        try:
+            for game in games:
+                self.game = game
+                moves.append(self.playsmart(time_budget, node_budget))
+        finally:
+            self.game = previous_game
+        return moves
+
+    def playsmart(self, time_budget=None, node_budget=None):
+        time_budget = self.time_budget if time_budget is None else time_budget
+        node_budget = self.node_budget if node_budget is None else node_budget
+        self.moves_scores = {}
+        self.nodes = 0
+        self.cutoffs = 0
+        self.killers = {}
+        # Older history scores count less than the ones of the coming search
+        for key in self.history:
+            self.history[key] //= 2
+        # It is our turn, the color to move is part of the positions stored in the transposition table
+        self.game.grid.board.set_side(0 if self.color == "blue" else 1)
+        if time_budget is None and node_budget is None:
+            if self.workers > 1:
+                self.parallel_search(self.base_depth)
+            else:
+                self.minimax(self.game, 0, self.base_depth, True)
+            self.last_depth = self.base_depth
+        else:
+            self.iterative_deepening(time_budget, node_budget)
+        return self.choose_best_move()
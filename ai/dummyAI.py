@@ -1,23 +1,35 @@
+import logging
 import random
 
 import numpy as np
 from game.env_var import *
 
+logger = logging.getLogger(__name__)
+
 
 class Dummyai:
-    def __init__(self, color):
+    def __init__(self, color, game=None):
         self.color = color
+        self.game = game
         self.type = "R"
 
     def playrandom(self, nextmouvs):
         if not nextmouvs:  # Vérifie si nextmouvs est vide
-            print("No moves available")
+            logger.info("No moves available")
             return None
         # return a random move from the list of all possible moves
         # if the pawn must play array isn't empty, the move is chosen in the list of pawns that must play
-        if pawns_must_play[self.color] != []:
-            print(nextmouvs)
-            while nextmouvs[np.random.randint(0, len(nextmouvs))] not in pawns_must_play[self.color]:
+        pawns_must_play = self.game.pawns_must_play[self.color] if self.game is not None else []
+        if pawns_must_play != []:
+            logger.debug("%s", nextmouvs)
+            while nextmouvs[np.random.randint(0, len(nextmouvs))] not in pawns_must_play:
                 return nextmouvs[np.random.randint(0, len(nextmouvs))]
         else :
-            return nextmouvs[np.random.randint(0, len(nextmouvs))]
\ No newline at end of file
+            return nextmouvs[np.random.randint(0, len(nextmouvs))]
+
+    # Pick a random move in each of several games with a single draw (None for a game without moves),
+    # so that one opponent can play for all the games of a vector env
+    def playrandom_batch(self, games):
+        all_moves = [game.all_next_moves(self.color) for game in games]
+        picks = (np.random.random(len(all_moves)) * [len(moves) for moves in all_moves]).astype(int)
+        return [moves[pick] if moves else None for moves, pick in zip(all_moves, picks)]
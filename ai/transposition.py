@@ -0,0 +1,90 @@
+# Transposition table for the Minimax search, keyed by the Zobrist hash of the positions
+
+# Kind of score stored in an entry
+EXACT = 0
+LOWER = 1  # the real score is at least the stored score (the search was cut, beta cutoff)
+UPPER = 2  # the real score is at most the stored score (no move reached alpha)
+
+# Rough size of an entry in memory (tuple, key, score and move), used to turn the memory cap into a number of entries
+ENTRY_BYTES = 200
+
+
+class TranspositionTable:
+    def __init__(self, max_mb=16, replacement="depth"):
+        """
+        :type max_mb: float
+        :type replacement: str
+        :param max_mb:      memory cap of the table in megabytes
+        :param replacement: "depth" to keep the deepest entry of each bucket (a second slot of the bucket is always
+                            replaced so that recent positions are still found), "always" to always replace the entry
+        """
+        if replacement not in ("depth", "always"):
+            raise ValueError("replacement must be 'depth' or 'always'")
+        self.replacement = replacement
+        entries = max(2, int(max_mb * 1024 * 1024 / ENTRY_BYTES))
+        if replacement == "depth":
+            entries //= 2
+        # Number of buckets, a power of two so that the bucket of a hash is hash & mask
+        size = 1
+        while size * 2 <= entries:
+            size *= 2
+        self.size = size
+        self.mask = size - 1
+        self.clear()
+
+    def clear(self):
+        # Each entry is a tuple (hash, depth, flag, score, best move)
+        self.deep = [None] * self.size
+        self.recent = [None] * self.size if self.replacement == "depth" else None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    # Return the entry of a position or None
+    def probe(self, hash):
+        index = hash & self.mask
+        entry = self.deep[index]
+        if entry is not None and entry[0] == hash:
+            self.hits += 1
+            return entry
+        if self.recent is not None:
+            entry = self.recent[index]
+            if entry is not None and entry[0] == hash:
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    # Store the result of the search of a position, depth is the depth searched below the position
+    def store(self, hash, depth, flag, score, best_move):
+        index = hash & self.mask
+        entry = (hash, depth, flag, score, best_move)
+        self.stores += 1
+        current = self.deep[index]
+        if self.recent is None or current is None or current[0] == hash or depth >= current[1]:
+            if current is not None and current[0] != hash:
+                self.overwrites += 1
+                # The entry pushed out of the deep slot is still worth keeping as a recent one
+                if self.recent is not None:
+                    self.recent[index] = current
+            self.deep[index] = entry
+        else:
+            if self.recent[index] is not None and self.recent[index][0] != hash:
+                self.overwrites += 1
+            self.recent[index] = entry
+
+    def stats(self):
+        probes = self.hits + self.misses
+        used = sum(entry is not None for entry in self.deep)
+        if self.recent is not None:
+            used += sum(entry is not None for entry in self.recent)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / probes if probes else 0.0,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "entries": used,
+            "capacity": self.size * (2 if self.recent is not None else 1),
+        }
@@ -0,0 +1,137 @@
+# Merge the CSV files of the dataset into one columnar store (see records.py), with an index of its games
+#
+# The empty files are dropped and a game found several times (same initial position and same moves) is kept once.
+# The index lists the games sorted by matchup, winner and number of turns, so that a query like "the M44 games won
+# by blue in less than 30 turns" is a binary search instead of a scan of the store.
+# Usage, from the root of the project: python -m data.consolidate
+
+import glob
+import hashlib
+import logging
+import os
+import shutil
+
+import numpy as np
+
+from data import records
+
+# Parameters
+dataset = "./data/dataset"  # Folder of the CSV files written by DataManager
+store = "./data/records"    # Folder of the consolidated store, replaced at each consolidation
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.npz"
+# Bits of the sort key of the index below the winner and the matchup: matchup << 33 | winner << 32 | turn
+_TURN_BITS = 32
+
+
+# Key of a game to find the duplicates: its initial position and its moves
+def _game_key(games, moves, i):
+    start, stop = games["move_start"][i], games["move_start"][i] + games["num_moves"][i]
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(games["initial_x"][i].tobytes())
+    digest.update(games["initial_y"][i].tobytes())
+    for column in ("turn", "color", "type", "x", "y"):
+        digest.update(moves[column][start:stop].tobytes())
+    return digest.digest()
+
+
+def consolidate(dataset_folder=dataset, root=store, chunk_size=100000):
+    """
+    Write the games of all the CSV files of a folder in a new store, with its index
+    :param dataset_folder: folder of the CSV files
+    :param root:           folder of the store, its previous content is replaced
+    :param chunk_size:     number of games per chunk of the store
+    :return: the number of games stored
+    """
+    sources = []
+    tables = []
+    source_of_games = []
+    for file_name in sorted(glob.glob(os.path.join(dataset_folder, "*.csv"))):
+        games, moves = records.read_csv(file_name)
+        if len(games["game_id"]) == 0:
+            logger.info("Skipping empty file %s", file_name)
+            continue
+        source_of_games.append(np.full(len(games["game_id"]), len(sources), dtype=np.int32))
+        sources.append(os.path.basename(file_name))
+        tables.append((games, moves))
+    games, moves = records.concatenate(tables)
+    source_of_games = np.concatenate(source_of_games) if source_of_games else np.zeros(0, dtype=np.int32)
+
+    seen = set()
+    kept = []
+    for i in range(len(games["game_id"])):
+        key = _game_key(games, moves, i)
+        if key not in seen:
+            seen.add(key)
+            kept.append(i)
+    logger.info("%s games, %s duplicates dropped", len(kept), len(games["game_id"]) - len(kept))
+    kept = np.array(kept, dtype=np.intp)
+    kept_moves = np.concatenate([np.arange(games["move_start"][i], games["move_start"][i] + games["num_moves"][i])
+                                 for i in kept]) if len(kept) else np.zeros(0, dtype=np.intp)
+    games, moves = records.concatenate([({column: values[kept] for column, values in games.items()},
+                                         {column: values[kept_moves] for column, values in moves.items()})])
+
+    # The store is built next to the previous one, which is only replaced once the new one is complete
+    building = root + ".tmp"
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+    records.write_chunks(building, games, moves, chunk_size)
+    _write_index(building, games, source_of_games[kept], sources)
+    shutil.rmtree(root, ignore_errors=True)
+    os.rename(building, root)
+    return len(kept)
+
+
+def _write_index(root, games, source_of_games, sources):
+    matchup_names, matchup_codes = np.unique(records.matchups(games), return_inverse=True)
+    keys = (matchup_codes.reshape(-1).astype(np.int64) << (_TURN_BITS + 1)
+            | games["winner"].astype(np.int64) << _TURN_BITS | games["turn"].astype(np.int64))
+    order = np.argsort(keys, kind="stable")
+    np.savez(os.path.join(root, INDEX_FILE), key=keys[order], game_id=games["game_id"][order],
+             source=source_of_games[order], matchups=matchup_names.astype(str), sources=np.array(sources, dtype=str))
+
+
+def load_index(root=store):
+    """
+    Index of a consolidated store, sorted by matchup, winner and number of turns
+    :return: dict {"key", "game_id", "source": arrays of the games, "matchups", "sources": names}
+    """
+    with np.load(os.path.join(root, INDEX_FILE)) as index:
+        return {name: index[name] for name in index.files}
+
+
+def query(index, matchup=None, winner=None, min_turn=0, max_turn=None, source=None):
+    """
+    Ids of the games of a consolidated store matching all the given criteria, in increasing order
+    :param index:    index of the store, see load_index
+    :param matchup:  matchup of the games, e.g. "M44" (see records.matchups), None for all of them
+    :param winner:   "blue" or "orange", None for both
+    :param min_turn: minimum number of turns
+    :param max_turn: number of turns the games end before, None for no limit
+    :param source:   name of the CSV file the games come from, None for all of them
+    """
+    matchups = range(len(index["matchups"])) if matchup is None else \
+        [i for i, name in enumerate(index["matchups"]) if name == matchup]
+    winners = range(len(records.COLORS)) if winner is None else [records.COLORS.index(winner)]
+    max_turn = 1 << _TURN_BITS if max_turn is None else max_turn
+
+    # Each (matchup, winner) pair is a contiguous range of the index, sorted by number of turns
+    ranges = []
+    for code in matchups:
+        for side in winners:
+            prefix = code << (_TURN_BITS + 1) | side << _TURN_BITS
+            start, stop = np.searchsorted(index["key"], [prefix + max(min_turn, 0), prefix + max_turn])
+            ranges.append(np.arange(start, stop))
+    positions = np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.intp)
+
+    if source is not None:
+        sources = [i for i, name in enumerate(index["sources"]) if name == source]
+        positions = positions[np.isin(index["source"][positions], sources)]
+    return np.sort(index["game_id"][positions])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    consolidate()
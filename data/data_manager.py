@@ -1,3 +1,4 @@
+import csv
 import os
 import pandas as pd
 from enum import Enum
@@ -11,22 +12,44 @@ class PawnType(Enum):
     ROOSTER = 1
 
 
+COLUMNS = ["ai", "victory", "turn", "retreat", "initial_pos", "final_stack", "donkey", "dog", "cat", "rooster"]
+
+
 class DataManager:
-    def __init__(self, overwrite=False, url=""):
+    def __init__(self, overwrite=False, url="", buffer_size=1, fsync=False, record_root=None,
+                 record_chunk_size=1000):
         """
         :type overwrite: bool
         :type url: str
+        :type buffer_size: int
+        :type fsync: bool
+        :type record_root: str
+        :type record_chunk_size: int
         :param overwrite:   define if we want to overwrite data into a specific file
         :param url:         the path of the file to overwrite
+        :param buffer_size: number of games kept in memory before they are appended to the file, 1 to append each
+                            game as soon as it is written (the buffered games are lost if flush is never called)
+        :param fsync:       force the system to put the file on disk after each append, slower but the games
+                            survive a crash of the machine
+        :param record_root: folder of a columnar store (see data/records.py) where the games are also added, in
+                            chunks of record_chunk_size games, None to only write the CSV
+        :param record_chunk_size: number of games of each chunk added to the store, whatever buffer_size is: the
+                            games appended to the CSV wait in memory until a chunk is full or close is called
         """
         self.root = "./data/dataset"
-        self.time = datetime.now().strftime('%Y%m%d_%H%M%S')
-        self.file_name = f"{self.root}/game_{self.time}.csv" if not overwrite else url
+        self.time = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        # The pid keeps the processes started at the same time (e.g. the workers of TacticiensSubprocVectorEnv) from
+        # appending to the same file
+        self.file_name = f"{self.root}/game_{self.time}_{os.getpid()}.csv" if not overwrite else url
+        self.buffer_size = buffer_size
+        self.fsync = fsync
+        self.record_root = record_root
+        # Rows of the games written but not yet appended to the file
+        self.buffer = []
+        # Rows of the games appended to the file but not yet added to the store
+        self.record_buffer = []
+        self.record_chunk_size = record_chunk_size
 
-        # We create a dataframe with the columns
-        self.df = pd.DataFrame(
-            columns=["ai", "victory", "turn", "retreat", "initial_pos", "final_stack", "donkey", "dog", "cat",
-                     "rooster"])
         # initial position of each pawn
         self.initial_pos = []
         # Each pawn (no matter the color) has its own list to store its position during the game
@@ -39,12 +62,14 @@ class DataManager:
         if not os.path.exists(self.root):
             os.makedirs(self.root)
 
-        if overwrite:
-            # read previous csv
-            previous_dataframe = pd.read_csv(self.file_name)
-            self.df = previous_dataframe
 
-        self.df.to_csv(self.file_name, header=True, index=False)
+    # The games of the file and of the buffer, read from the file when needed: the dataframe is never used to write
+    @property
+    def df(self):
+        self.flush()
+        if not os.path.exists(self.file_name) or os.path.getsize(self.file_name) == 0:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.read_csv(self.file_name)
 
     def print_initial_pos(self):
         print(self.initial_pos)
@@ -52,7 +77,7 @@ class DataManager:
     def set_initial_pos(self, color, _type, pos):
         self.initial_pos.append({"color": color, "type": _type, "pos": pos})
 
-    # Write data to the CSV file
+    # Add a game to the CSV file, the games are appended to the file, which is never rewritten
     def write(self, ai, winner, turn, retreat, final_stack):
         obj = {
             "ai": ai,
@@ -67,9 +92,48 @@ class DataManager:
             "rooster": self.rooster
         }
 
-        self.df.loc[len(self.df)] = obj
+        self.buffer.append(obj)
+        self.new_game()
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    # Append the buffered games to the CSV file, the file and its header are created with the first game
+    def flush(self):
+        if not self.buffer:
+            return
+        new_file = not os.path.exists(self.file_name) or os.path.getsize(self.file_name) == 0
+        with open(self.file_name, "a", newline="") as file:
+            # Same format as DataFrame.to_csv: the lists and dicts are written with str
+            writer = csv.writer(file, lineterminator=os.linesep)
+            if new_file:
+                writer.writerow(COLUMNS)
+            writer.writerows([[obj[column] for column in COLUMNS] for obj in self.buffer])
+            if self.fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        if self.record_root is not None:
+            self.record_buffer.extend(self.buffer)
+            if len(self.record_buffer) >= self.record_chunk_size:
+                self.flush_records()
+        self.buffer = []
+
+    # Add the games waiting for the store as one chunk, even if it is not full
+    def flush_records(self):
+        if not self.record_buffer:
+            return
+        # Imported here so that data_manager can still be imported from data/ by the notebook
+        from data.records import records_from_games, write_chunk
+        write_chunk(self.record_root, *records_from_games(self.record_buffer))
+        self.record_buffer = []
+
+    # Write all the games still in memory, to the CSV file then to the store
+    def close(self):
+        self.flush()
+        self.flush_records()
+
+    # Forget the data of the current game (initial positions and pawn histories), a new game starts
+    def new_game(self):
         self.donkey, self.dog, self.cat, self.rooster, self.initial_pos = [], [], [], [], []
-        self.df.to_csv(self.file_name, header=True, index=False)
 
     def update_pawn_history(self, color, _type, pos, turn):
         # data is an object containing the color, type, pos and turn of the pawn
@@ -85,4 +149,4 @@ class DataManager:
                 self.rooster.append(obj)
 
     def to_csv(self):
-        self.df.to_csv(self.file_name, header=True, index=False)
+        self.flush()
@@ -1,6 +1,20 @@
+import glob
+import itertools
+import os
+
 import numpy as np
 import pandas as pd
 
+try:
+    from data import records
+except ImportError:
+    # Le notebook importe functions depuis le dossier data
+    import records
+
+# Nom des pions par type - 1
+PAWN_TYPES = ("rooster", "cat", "dog", "donkey")
+
+
 def get_ai_information(_ai):
     _type = _ai["type"]
     if _type == "M":
@@ -31,4 +45,71 @@ def get_grid_occupation(df, _type=None, color=None):
                     grid[y][x] += 1
                 elif pawn["color"] == color:
                     grid[y][x] += 1
-    return pd.DataFrame(grid, columns=["0", "1", "2", "3", "4"])
\ No newline at end of file
+    return pd.DataFrame(grid, columns=["0", "1", "2", "3", "4"])
+
+
+# Tables (games, moves) d'une ou plusieurs sources, voir records.py. Une source est un fichier CSV du dataset, un
+# dossier de fichiers CSV (e.g. ./dataset), un dossier de stockage en colonnes ou des tables déjà chargées
+def load_tables(sources):
+    if isinstance(sources, (str, tuple)):
+        sources = [sources]
+    tables = []
+    for source in sources:
+        if isinstance(source, tuple):
+            tables.append(source)
+        elif records.list_chunks(source):
+            tables.append(records.load_records(source))
+        elif os.path.isdir(source):
+            tables.append(records.read_csv(sorted(glob.glob(os.path.join(source, "*.csv")))))
+        else:
+            tables.append(records.read_csv(source))
+    return records.concatenate(tables)
+
+
+# Index du groupe de chaque partie et noms des groupes, pour les clés "matchup", "color" et "type"
+def _group_codes(games, moves, key):
+    if key == "matchup":
+        names, codes = np.unique(records.matchups(games), return_inverse=True)
+        return names.tolist(), np.repeat(codes.reshape(-1), games["num_moves"])
+    if key == "color":
+        return list(records.COLORS), moves["color"].astype(np.intp)
+    if key == "type":
+        return list(PAWN_TYPES), moves["type"].astype(np.intp) - 1
+    raise ValueError(f"Clé de groupe inconnue: {key}")
+
+
+# Version vectorisée de get_grid_occupation: nombre de fois où chaque case a été occupée par un pion, pour chaque
+# groupe de mouvements, en un seul passage sur la table des mouvements de toutes les sources
+# Retourne un dictionnaire {groupe: dataframe 5x5 comme get_grid_occupation}, le groupe est le tuple des valeurs des
+# clés de by, e.g. ("M44", "blue", "donkey") pour by=("matchup", "color", "type")
+def get_grid_occupations(sources, by=("matchup", "color", "type")):
+    games, moves = load_tables(sources)
+    groups = [_group_codes(games, moves, key) for key in by]
+    shape = [len(names) for names, _ in groups] + [25]
+
+    # Index à plat (groupe, case) de chaque mouvement, puis comptage de tous les index à la fois
+    index = np.zeros(len(moves["x"]), dtype=np.intp)
+    for names, codes in groups:
+        index = index * len(names) + codes
+    index = index * 25 + moves["y"].astype(np.intp) * 5 + moves["x"]
+    grids = np.bincount(index, minlength=int(np.prod(shape))).reshape(shape[:-1] + [5, 5])
+
+    return {group: pd.DataFrame(grids[position].astype(float), columns=["0", "1", "2", "3", "4"])
+            for position, group in zip(np.ndindex(*shape[:-1]), itertools.product(*[names for names, _ in groups]))}
+
+
+# Version vectorisée de count_stack_by_color: True pour chaque partie dont la pile finale est d'une seule couleur
+def get_stacks_of_one_color(games):
+    colors = np.asarray(games["final_color"])
+    return ((colors == colors[:, :1]) | (colors < 0)).all(axis=1)
+
+
+# Nombre de parties et de parties terminées avec une pile d'une seule couleur, pour chaque matchup et vainqueur
+def count_stacks_by_color(sources):
+    games, _ = load_tables(sources)
+    df = pd.DataFrame({
+        "matchup": records.matchups(games),
+        "victory": np.array(records.COLORS)[games["winner"]],
+        "same_color": get_stacks_of_one_color(games),
+    })
+    return df.groupby(["matchup", "victory"])["same_color"].agg(games="size", same_color="sum")
@@ -0,0 +1,254 @@
+# Columnar store of game records: typed arrays instead of the Python literals written in the CSV cells
+#
+# A store is a folder of chunks, each chunk is a folder holding one .npy file per column:
+#   - games.<column>.npy: one row per game, see GAME_COLUMNS
+#   - moves.<column>.npy: one row per move, sorted by game then turn, see MOVE_COLUMNS
+# The .npy files are memory-mapped by the readers, so a query only reads the columns it uses. Only the tables of a
+# store with a single chunk are memory-mapped as a whole, load_records concatenates the chunks of the others in memory:
+# DataManager adds large chunks (record_chunk_size games) and a store written over many runs is compacted into one
+# chunk per chunk_size games by consolidate.py.
+# Colors are coded 0 for blue and 1 for orange, the AIs by the index of their type in AI_TYPES. The initial
+# positions are indexed by the board slot of the pawn (type - 1 for the blue pawns, type + 3 for the orange ones, as
+# in game/board.py), -1 for a pawn never placed.
+
+import ast
+import os
+
+import numpy as np
+import pandas as pd
+
+COLORS = ("blue", "orange")
+# Types of the AIs written by DataManager: Minimax, random and the DQN agent of the env
+AI_TYPES = ("M", "R", "DQN")
+# Columns of the CSV holding the moves of each pawn type
+PAWN_COLUMNS = ("donkey", "dog", "cat", "rooster")
+
+# Game table: dtype and shape of the column for one game
+GAME_COLUMNS = {
+    "game_id": (np.int64, ()),
+    "blue_ai": (np.int8, ()),       # index of the type in AI_TYPES
+    "blue_depth": (np.int8, ()),    # 0 for the AIs without depth
+    "orange_ai": (np.int8, ()),
+    "orange_depth": (np.int8, ()),
+    "winner": (np.int8, ()),
+    "turn": (np.int32, ()),
+    "retreat": (np.int32, ()),
+    "initial_x": (np.int8, (8,)),
+    "initial_y": (np.int8, (8,)),
+    "final_type": (np.int8, (4,)),  # pawns of the final stack in the order of the CSV, 0 for no pawn
+    "final_color": (np.int8, (4,)),
+    "final_x": (np.int8, ()),
+    "final_y": (np.int8, ()),
+    "move_start": (np.int64, ()),   # first move of the game in the move table
+    "num_moves": (np.int32, ()),
+}
+# Move table: dtype of each column
+MOVE_COLUMNS = {
+    "game_id": np.int64,
+    "turn": np.int32,
+    "color": np.int8,
+    "type": np.int8,
+    "x": np.int8,
+    "y": np.int8,
+}
+
+CHUNK_PREFIX = "chunk_"
+
+
+def _parse(value):
+    return ast.literal_eval(value) if isinstance(value, str) else value
+
+
+def records_from_games(games, first_game_id=0):
+    """
+    Typed tables of a list of games
+    :param games:         games as written by DataManager.write, dicts with the columns of the CSV, the lists and
+                          dicts may also be the strings of the CSV cells
+    :param first_game_id: id of the first game, the next games follow
+    :return: (games, moves), dicts {column: array}
+    """
+    table = {name: np.zeros((len(games),) + shape, dtype) for name, (dtype, shape) in GAME_COLUMNS.items()}
+    table["game_id"][:] = np.arange(first_game_id, first_game_id + len(games))
+    for name in ("initial_x", "initial_y", "final_color", "final_x", "final_y"):
+        table[name][:] = -1
+    moves = []
+
+    for i, game in enumerate(games):
+        game_id = first_game_id + i
+        for ai in _parse(game["ai"]):
+            side = ai["color"].lower()
+            if ai["type"] not in AI_TYPES:
+                raise ValueError(f"Unknown AI type {ai['type']!r}, add it to AI_TYPES")
+            table[f"{side}_ai"][i] = AI_TYPES.index(ai["type"])
+            table[f"{side}_depth"][i] = ai["depth"] or 0
+        table["winner"][i] = COLORS.index(game["victory"].lower())
+        table["turn"][i] = game["turn"]
+        table["retreat"][i] = game["retreat"]
+
+        # A pawn placed several times keeps its last position
+        for pawn in _parse(game["initial_pos"]):
+            slot = pawn["type"] - 1 + 4 * COLORS.index(pawn["color"])
+            table["initial_x"][i, slot], table["initial_y"][i, slot] = pawn["pos"]
+        for j, pawn in enumerate(_parse(game["final_stack"])):
+            table["final_type"][i, j] = pawn["type"]
+            table["final_color"][i, j] = COLORS.index(pawn["color"])
+            table["final_x"][i], table["final_y"][i] = pawn["pos"]
+
+        game_moves = [(game_id, move["turn"], COLORS.index(move["color"]), move["type"]) + tuple(move["pos"])
+                      for column in PAWN_COLUMNS for move in _parse(game[column])]
+        game_moves.sort(key=lambda move: move[1])
+        table["move_start"][i] = len(moves)
+        table["num_moves"][i] = len(game_moves)
+        moves.extend(game_moves)
+
+    columns = list(zip(*moves)) if moves else [()] * len(MOVE_COLUMNS)
+    moves = {name: np.array(column, dtype) for (name, dtype), column in zip(MOVE_COLUMNS.items(), columns)}
+    return table, moves
+
+
+def read_csv(file_names, first_game_id=0):
+    """
+    Typed tables of the games of one or several CSV files written by DataManager
+    :return: (games, moves), see records_from_games
+    """
+    if isinstance(file_names, str):
+        file_names = [file_names]
+    games = []
+    for file_name in file_names:
+        if os.path.getsize(file_name) > 0:
+            games.extend(pd.read_csv(file_name).to_dict("records"))
+    return records_from_games(games, first_game_id)
+
+
+def list_chunks(root):
+    """Folders of the chunks of a store, in the order they were written"""
+    if not os.path.isdir(root):
+        return []
+    return [os.path.join(root, name) for name in sorted(os.listdir(root))
+            if name.startswith(CHUNK_PREFIX) and not name.endswith(".tmp")]
+
+
+def _load_column(chunk, table, column, mmap_mode):
+    return np.load(os.path.join(chunk, f"{table}.{column}.npy"), mmap_mode=mmap_mode)
+
+
+def num_games(root):
+    """Number of games of a store, read from the headers of the .npy files"""
+    return sum(len(_load_column(chunk, "games", "game_id", "r")) for chunk in list_chunks(root))
+
+
+def write_chunk(root, games, moves):
+    """
+    Add a chunk to a store, its game ids are shifted to follow the ones already stored
+    :param games: game table, see records_from_games
+    :param moves: move table of the same games
+    :return: the folder of the chunk
+    """
+    chunks = list_chunks(root)
+    offset = num_games(root) - int(games["game_id"][0]) if len(games["game_id"]) else 0
+    index = int(os.path.basename(chunks[-1])[len(CHUNK_PREFIX):]) + 1 if chunks else 0
+    chunk = os.path.join(root, f"{CHUNK_PREFIX}{index:06d}")
+
+    # The chunk is written in a temporary folder and renamed once complete, readers never see half a chunk
+    os.makedirs(chunk + ".tmp", exist_ok=True)
+    for table, columns in (("games", games), ("moves", moves)):
+        for column, values in columns.items():
+            if column == "game_id":
+                values = values + offset
+            np.save(os.path.join(chunk + ".tmp", f"{table}.{column}.npy"), values)
+    os.rename(chunk + ".tmp", chunk)
+    return chunk
+
+
+def load_chunk(chunk, game_columns=None, move_columns=None, mmap_mode="r"):
+    """
+    Tables of one chunk, memory-mapped by default
+    :param game_columns: columns of the game table to load, None for all of them
+    :param move_columns: columns of the move table to load, None for all of them
+    :return: (games, moves), dicts {column: array}
+    """
+    games = {column: _load_column(chunk, "games", column, mmap_mode) for column in game_columns or GAME_COLUMNS}
+    moves = {column: _load_column(chunk, "moves", column, mmap_mode) for column in move_columns or MOVE_COLUMNS}
+    return games, moves
+
+
+def load_records(root, game_columns=None, move_columns=None, mmap_mode="r"):
+    """
+    Tables of all the games of a store. The arrays of a store with a single chunk are memory-mapped, the ones of
+    several chunks are concatenated (move_start then indexes the concatenated move table)
+    :return: (games, moves), dicts {column: array}, see load_chunk
+    """
+    chunks = list_chunks(root)
+    if len(chunks) == 1:
+        return load_chunk(chunks[0], game_columns, move_columns, mmap_mode)
+
+    games = {column: [] for column in game_columns or GAME_COLUMNS}
+    moves = {column: [] for column in move_columns or MOVE_COLUMNS}
+    num_moves = 0
+    for chunk in chunks:
+        chunk_games, chunk_moves = load_chunk(chunk, game_columns, move_columns, mmap_mode)
+        for column, values in chunk_games.items():
+            games[column].append(values + num_moves if column == "move_start" else values)
+        for column, values in chunk_moves.items():
+            moves[column].append(values)
+        num_moves += len(_load_column(chunk, "moves", "game_id", "r"))
+
+    empty_games, empty_moves = records_from_games([])
+    games = {column: np.concatenate(values) if values else empty_games[column] for column, values in games.items()}
+    moves = {column: np.concatenate(values) if values else empty_moves[column] for column, values in moves.items()}
+    return games, moves
+
+
+def concatenate(tables):
+    """
+    Tables of several sets of games, the games are renumbered from 0 and move_start indexes the concatenated moves
+    :param tables: list of (games, moves) with all the columns
+    :return: (games, moves)
+    """
+    tables = list(tables) or [records_from_games([])]
+    games = {column: np.concatenate([table[0][column] for table in tables]) for column in GAME_COLUMNS}
+    moves = {column: np.concatenate([table[1][column] for table in tables]) for column in MOVE_COLUMNS}
+    games["game_id"] = np.arange(len(games["game_id"]))
+    games["move_start"] = np.cumsum(games["num_moves"], dtype=np.int64) - games["num_moves"]
+    moves["game_id"] = np.repeat(games["game_id"], games["num_moves"])
+    return games, moves
+
+
+def matchups(games):
+    """
+    Matchup of each game, named like the dataset files: "M44" for two Minimax of depth 4, "RR" for two random AIs,
+    "M4R" for a Minimax of depth 4 playing blue against a random AI, "DQNR" for the DQN agent against a random AI
+    :return: array of str
+    """
+    keys = np.stack([games["blue_ai"], games["blue_depth"], games["orange_ai"], games["orange_depth"]],
+                    axis=1).astype(np.int16)
+    keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    names = []
+    for blue_ai, blue_depth, orange_ai, orange_depth in keys:
+        blue = AI_TYPES[blue_ai] + (str(blue_depth) if blue_depth else "")
+        orange = AI_TYPES[orange_ai] + (str(orange_depth) if orange_depth else "")
+        # Two Minimax only differ by their depths
+        names.append(blue + orange[1:] if AI_TYPES[blue_ai] == AI_TYPES[orange_ai] == "M" else blue + orange)
+    return np.array(names, dtype=str)[inverse.reshape(-1)]
+
+
+def write_chunks(root, games, moves, chunk_size=100000):
+    """Add tables to a store, in chunks of chunk_size games"""
+    total = len(games["game_id"])
+    for start in range(0, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        move_start = games["move_start"][start]
+        move_stop = games["move_start"][stop - 1] + games["num_moves"][stop - 1]
+        chunk_games = {column: values[start:stop] for column, values in games.items()}
+        chunk_games["move_start"] = chunk_games["move_start"] - move_start
+        write_chunk(root, chunk_games, {column: values[move_start:move_stop] for column, values in moves.items()})
+
+
+def convert_csv(file_names, root, chunk_size=100000):
+    """
+    Store the games of CSV files written by DataManager, in chunks of chunk_size games
+    :return: the number of games stored
+    """
+    games, moves = read_csv(file_names)
+    write_chunks(root, games, moves, chunk_size)
+    return len(games["game_id"])
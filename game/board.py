@@ -0,0 +1,230 @@
+# Compact board state: one packed int per cell and an 8-entry pawn table
+#
+# A stack is always strictly decreasing from bottom to top (a pawn can only go on top of a
+# bigger one), so the set of types in a cell is enough to rebuild the whole stack.
+# Each cell is packed in a single int:
+#   bits 0-3: type mask (bit t-1 set if a pawn of type t is in the cell)
+#   bits 4-7: orange mask (bit t+3 set if the pawn of type t in the cell is orange)
+# The pawn table stores the position of each pawn, indexed by its slot:
+#   slot = type - 1 for blue pawns, type + 3 for orange pawns
+#
+# The board also keeps a 64 bits Zobrist hash of the position, updated on every change:
+# one key per (slot, cell), one key for "orange to move" and one key per pawn that must play (retreat)
+#
+# Score tables (one score per square and per packed cell) can be tracked the same way: the board keeps the sum of
+# each tracked table over its cells and only updates the cells that change
+
+import random
+
+COLORS = ("blue", "orange")
+
+
+def slot_of(color, type):
+    return (4 if color == "orange" else 0) + type - 1
+
+
+def _build_stacks():
+    stacks = []
+    for mask in range(16):
+        stacks.append(tuple(t for t in (4, 3, 2, 1) if mask & (1 << (t - 1))))
+    return tuple(stacks)
+
+
+def _build_slots():
+    slots = []
+    for cell in range(256):
+        slots.append(tuple(t - 1 + (4 if cell & (16 << (t - 1)) else 0) for t in STACKS[cell & 15]))
+    return tuple(slots)
+
+
+# Lookup tables indexed by the type mask of a cell
+STACKS = _build_stacks()
+TOPS = tuple(stack[-1] if stack else 0 for stack in STACKS)
+HEIGHTS = tuple(len(stack) for stack in STACKS)
+# Lookup table indexed by the full packed cell: slots of the pawns in the stack, bottom first
+SLOTS = _build_slots()
+
+# Zobrist keys, always generated from the same seed so that hashes can be stored and compared between runs
+_keys = random.Random(0x7AC71C1E)
+ZOBRIST_PAWN = tuple(tuple(_keys.getrandbits(64) for _ in range(25)) for _ in range(8))
+ZOBRIST_ORANGE_TO_MOVE = _keys.getrandbits(64)
+ZOBRIST_RETREAT = tuple(_keys.getrandbits(64) for _ in range(8))
+
+
+class Board:
+    def __init__(self, size=5):
+        self.size = size
+        self.cells = [0] * (size * size)
+        # Pawn table, -1 when the pawn is not on the board
+        self.pawn_x = [-1] * 8
+        self.pawn_y = [-1] * 8
+        # Color to move (0: blue, 1: orange), mask of the slots that must play and hash of the whole position
+        self.side = 0
+        self.retreat = 0
+        self.hash = 0
+        # Tracked score tables, their index by id and their sum over the cells
+        self.score_tables = []
+        self.score_index = {}
+        self.scores = []
+
+    def clear(self):
+        self.cells = [0] * (self.size * self.size)
+        self.pawn_x = [-1] * 8
+        self.pawn_y = [-1] * 8
+        self.side = 0
+        self.retreat = 0
+        self.hash = 0
+        self.scores = [self.compute_score(table) for table in self.score_tables]
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.size = self.size
+        board.cells = self.cells[:]
+        board.pawn_x = self.pawn_x[:]
+        board.pawn_y = self.pawn_y[:]
+        board.side = self.side
+        board.retreat = self.retreat
+        board.hash = self.hash
+        board.score_tables = self.score_tables[:]
+        board.score_index = dict(self.score_index)
+        board.scores = self.scores[:]
+        return board
+
+    # The tracked tables are found by their id, which doesn't survive a copy to another process: a board copied with
+    # pickle or deepcopy tracks its tables again on first use
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["score_tables"] = []
+        state["score_index"] = {}
+        state["scores"] = []
+        return state
+
+    # Hash of the position computed from scratch, the incremental hash must always be equal to it
+    def compute_hash(self):
+        hash = ZOBRIST_ORANGE_TO_MOVE if self.side else 0
+        for sq, cell in enumerate(self.cells):
+            for slot in SLOTS[cell]:
+                hash ^= ZOBRIST_PAWN[slot][sq]
+        for slot in range(8):
+            if self.retreat & (1 << slot):
+                hash ^= ZOBRIST_RETREAT[slot]
+        return hash
+
+    # Sum of a score table over the cells computed from scratch, the tracked sum must always be equal to it
+    def compute_score(self, table):
+        return sum([table[sq][cell] for sq, cell in enumerate(self.cells)])
+
+    # Keep the sum of a score table (indexed by [square][packed cell]) up to date and return its index in self.scores
+    def track(self, table):
+        index = self.score_index.get(id(table))
+        if index is None:
+            index = len(self.score_tables)
+            self.score_tables.append(table)
+            self.score_index[id(table)] = index
+            self.scores.append(self.compute_score(table))
+        return index
+
+    # Replace the content of a cell, only the tracked scores are updated (used to undo a move, the caller restores
+    # the hash and the pawn table)
+    def set_cell(self, sq, cell):
+        old = self.cells[sq]
+        if old != cell:
+            self.cells[sq] = cell
+            for index, table in enumerate(self.score_tables):
+                self.scores[index] += table[sq][cell] - table[sq][old]
+
+    # Set the pawns that must play (mask of slots)
+    def set_retreat(self, retreat):
+        changed = self.retreat ^ retreat
+        if changed:
+            for slot in range(8):
+                if changed & (1 << slot):
+                    self.hash ^= ZOBRIST_RETREAT[slot]
+            self.retreat = retreat
+
+    # Set the color to move (0: blue, 1: orange)
+    def set_side(self, side):
+        if side != self.side:
+            self.hash ^= ZOBRIST_ORANGE_TO_MOVE
+            self.side = side
+
+    # Return the pawn types of the stack at a given position, bottom first
+    def stack(self, x, y):
+        return STACKS[self.cells[y * self.size + x] & 15]
+
+    def top(self, x, y):
+        return TOPS[self.cells[y * self.size + x] & 15]
+
+    def height(self, x, y):
+        return HEIGHTS[self.cells[y * self.size + x] & 15]
+
+    # Return the slots of the pawns in the stack at a given position, bottom first
+    def slots(self, x, y):
+        return SLOTS[self.cells[y * self.size + x]]
+
+    # Return the color of the pawn of a given type at a given position (None if there is none)
+    def color_at(self, x, y, type):
+        if type < 1:
+            return None
+        cell = self.cells[y * self.size + x]
+        bit = 1 << (type - 1)
+        if not cell & bit:
+            return None
+        return "orange" if cell & (bit << 4) else "blue"
+
+    # Put a single pawn on a cell, replacing its content (used to place the pawns)
+    def place(self, slot, x, y):
+        self.lift(slot)
+        self.pawn_x[slot] = x
+        self.pawn_y[slot] = y
+        if x < 0 or y < 0:
+            return
+        sq = y * self.size + x
+        for replaced in SLOTS[self.cells[sq]]:
+            self.hash ^= ZOBRIST_PAWN[replaced][sq]
+        bit = 1 << (slot & 3)
+        self.set_cell(sq, bit | (bit << 4 if slot > 3 else 0))
+        self.hash ^= ZOBRIST_PAWN[slot][sq]
+
+    # Remove a single pawn from its cell, the pawn table is left untouched
+    def lift(self, slot):
+        x, y = self.pawn_x[slot], self.pawn_y[slot]
+        if x < 0 or y < 0:
+            return
+        sq = y * self.size + x
+        bit = 1 << (slot & 3)
+        if self.cells[sq] & bit:
+            self.set_cell(sq, self.cells[sq] & ~(bit | (bit << 4)))
+            self.hash ^= ZOBRIST_PAWN[slot][sq]
+
+    # Move a pawn and every pawn above it to a given position, on top of the stack already there
+    # The other color is then to move and the pawn doesn't have to play anymore
+    def move(self, slot, x, y):
+        size = self.size
+        src = self.pawn_y[slot] * size + self.pawn_x[slot]
+        dst = y * size + x
+        cells = self.cells
+        cell = cells[src]
+        target = cells[dst]
+        # Pawns above a pawn of type t are the ones with a type lower than t
+        moving = cell & (((2 << (slot & 3)) - 1) * 17)
+        cells[src] = cell & ~moving
+        cells[dst] = target | moving
+        if self.score_tables:
+            scores = self.scores
+            for index, table in enumerate(self.score_tables):
+                scores[index] += (table[src][cell & ~moving] - table[src][cell] +
+                                  table[dst][target | moving] - table[dst][target])
+        hash = self.hash
+        for moved in SLOTS[moving]:
+            self.pawn_x[moved] = x
+            self.pawn_y[moved] = y
+            keys = ZOBRIST_PAWN[moved]
+            hash ^= keys[src] ^ keys[dst]
+        if self.side == slot >> 2:
+            hash ^= ZOBRIST_ORANGE_TO_MOVE
+            self.side ^= 1
+        if self.retreat & (1 << slot):
+            hash ^= ZOBRIST_RETREAT[slot]
+            self.retreat &= ~(1 << slot)
+        self.hash = hash
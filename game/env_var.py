@@ -13,9 +13,3 @@ def distance(pawn, x, y):
     x = abs(pawn.x - x)
     y = abs(pawn.y - y)
     return [x, y]
-
-# Pawns that must play (that is in the retreat area)
-pawns_must_play = {
-    "orange":[],
-    "blue":[],
-}
\ No newline at end of file
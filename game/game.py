@@ -1,9 +1,13 @@
 from game.pawn import Pawn
 from game.grid import Grid
-from game.mouvement import Mouvement
+from game.mouvement import Mouvement, NEXT_MOVES, BLOCKING
+from game.board import slot_of, COLORS, SLOTS, STACKS, TOPS
 import numpy as np
 from game.env_var import *
 import copy
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def get_user_input(message, valid_inputs):
@@ -21,9 +25,16 @@ class Game:
         self.data_manager = data_manager
         # List of pawns
         self.pawns = []
+        self.pawn_index = {}
         self.num_retreat = 0
+        # Pawns that must play (that are in the retreat area), set by isretraite
+        self.pawns_must_play = {"orange": [], "blue": []}
 
         self.mode = manual_mode
+        self.initializing = False
+        # The evaluations are read from the sums kept up to date by the board, False to rescan all the cells
+        # (slower, used to check the incremental sums)
+        self.incremental_eval = True
 
         # custom parameters for the game
         self.use_ai = use_ai
@@ -57,16 +68,29 @@ class Game:
 
         # Init the grid and display it
         self.grid = Grid(5, self.pawns)
+        self.index_pawns()
         #self.grid.grid[4][4] = np.array([0])
-        self.grid.display()
+        logger.info("\n%s", self.grid)
     
-    # Reset the game
+    # Reset the game, the pawns and the grid are kept and the pawns are placed again at random
     def reset(self):
-        self.pawns = []
         self.num_retreat = 0
+        self.pawns_must_play = {"orange": [], "blue": []}
+        self.grid.clear()
         self.init_infinite()
-        self.grid = Grid(5, self.pawns)
-        self.grid.display()
+        logger.info("\n%s", self.grid)
+
+    # Index the pawns by (color, type), the pawns of a cell are found from the board
+    def index_pawns(self):
+        self.pawn_index = {(pawn.color, pawn.type): pawn for pawn in self.pawns}
+
+    # Return the pawn of a given color and type
+    def get_pawn(self, color, type):
+        return self.pawn_index.get((color, type))
+
+    # Return the pawns of the stack at a given position, bottom first
+    def pawns_at(self, x, y):
+        return [self.grid.pawns_by_slot[slot] for slot in self.grid.board.slots(x, y)]
 
     # Init the AI pawns
     def init_infinite(self):
@@ -141,7 +165,7 @@ class Game:
         print("All pawns placed")
         print("-----Starting game-----")
 
-    # Place the pawns automatically
+    # Place the pawns automatically, the pawns already created are moved to their new position
     def init_pawns(self, color):
         mouvs = []
         for key in basic_mouvements.keys():
@@ -166,19 +190,21 @@ class Game:
             else:
                 usedmouvs.append(mouvs[nextmouv])
 
-            if color == "blue":
-                pawn = Pawn(nextpos, 0, i + 1, mouvs[i], color)
-                self.data_manager.set_initial_pos(color, i + 1, (nextpos, 0))
+            y = 0 if color == "blue" else 4
+            pawn = self.get_pawn(color, i + 1)
+            if pawn is None:
+                pawn = Pawn(nextpos, y, i + 1, mouvs[i], color)
                 self.pawns.append(pawn)
             else:
-                pawn = Pawn(nextpos, 4, i + 1, mouvs[i], color)
-                self.data_manager.set_initial_pos(color, i + 1, (nextpos, 4))
-                self.pawns.append(pawn)
+                pawn.place(nextpos, y)
+            self.data_manager.set_initial_pos(color, i + 1, (nextpos, y))
 
     # Check if a pawn is in the retraite area and add it to the list of pawns that must be played
     def isretraite(self, lastmove):
+        pawns_must_play = self.pawns_must_play
         pawns_must_play["blue"] = []
         pawns_must_play["orange"] = []
+        self.grid.board.set_retreat(0)
         if lastmove[1] != "Pawn":
             if lastmove[0] == "blue":
                 for pawn in self.pawns:
@@ -196,6 +222,7 @@ class Game:
                 if len(pawns_must_play[key]) > 1:
                     while len(pawns_must_play[key]) >= 2:
                         pawns_must_play[key].pop(0)
+            self.grid.board.set_retreat(sum(1 << pawn.slot for key in pawns_must_play for pawn in pawns_must_play[key]))
             if pawns_must_play["blue"] != [] or pawns_must_play["orange"] != []:
                 return True
             else:
@@ -203,60 +230,102 @@ class Game:
 
     # Get all the next moves available for a player
     def all_next_moves(self, color):
+        if not self.initializing:
+            return list(self.iter_next_moves(color))
+
         next_moves = []
         for pawn in self.pawns:
             for x in range(5):
                 for y in range(5):
-                    if self.initializing == True and self.grid.grid[y][x] == 0:
+                    if self.grid.board.top(x, y) == 0:
                         if y == 0 and pawn.color == color and pawn.x == -1:
                             if [pawn.color, pawn.type, x, 0] not in next_moves:
                                 next_moves.append([pawn.color, pawn.type, x, 0])
                         elif y == 4 and pawn.color == color and pawn.x == -1:
                             if [pawn.color, pawn.type, x, 4] not in next_moves:
                                 next_moves.append([pawn.color, pawn.type, x, 4])
-                    if Mouvement.legit_mouv(pawn, pawn, x, y, self.grid) and pawn.x != x and pawn.y != y and pawn.color == color and self.initializing == False:
-                        if pawns_must_play[color] == []:
-                            next_moves.append([pawn.color, pawn.type, x, y])
-                        else:
-                            if pawn in pawns_must_play[color]:
-                                next_moves.append([pawn.color, pawn.type, x, y])
         return next_moves
 
-    # Function to simulate a move for the AI
-    def simulate_move(self, color, type, x, y):
+    # Yield the next moves available for a player one by one, only looking at the squares each of its pawns can reach
+    def iter_next_moves(self, color):
+        cells = self.grid.board.cells
+        must_play = self.pawns_must_play[color]
         for pawn in self.pawns:
-            if pawn.color == color and pawn.type == type:
-                ispawnmoved = pawn.move(x, y, self.grid, self.pawns, self, simulate=True)
+            if pawn.color != color or (must_play and pawn not in must_play) or pawn.x < 0:
+                continue
+            type = pawn.type
+            blocking = BLOCKING[(pawn.mouvement, type)]
+            for x, y, dst, path in NEXT_MOVES[pawn.mouvement][pawn.y * 5 + pawn.x]:
+                top = TOPS[cells[dst] & 15]
+                if top != 0 and top <= type:
+                    continue
+                for cell in path:
+                    if blocking[cells[cell] & 15]:
+                        break
+                else:
+                    yield [color, type, x, y]
 
-        return ispawnmoved
+    # Function to simulate a move for the AI
+    def simulate_move(self, color, type, x, y):
+        pawn = self.pawn_index[(color, type)]
+        return pawn.move(x, y, self.grid, self.pawns, self, simulate=True)
+
+    # Play a move in place (the move must come from all_next_moves) and return a token to undo it
+    # The retreat state is updated as if the move was the last move of the game
+    def apply_move(self, move):
+        color, type, x, y = move
+        board = self.grid.board
+        slot = slot_of(color, type)
+        src_x, src_y = board.pawn_x[slot], board.pawn_y[slot]
+        token = (src_x, src_y, x, y, board.cells[src_y * board.size + src_x], board.cells[y * board.size + x],
+                 list(self.pawns_must_play["blue"]), list(self.pawns_must_play["orange"]), board.side, board.retreat,
+                 board.hash)
+        board.move(slot, x, y)
+        self.isretraite(move)
+        return token
+
+    # Undo a move played with apply_move, the moves must be undone in the reverse order
+    def undo_move(self, token):
+        src_x, src_y, x, y, src_cell, dst_cell, must_play_blue, must_play_orange, side, retreat, hash = token
+        board = self.grid.board
+        board.set_cell(src_y * board.size + src_x, src_cell)
+        board.set_cell(y * board.size + x, dst_cell)
+        for slot in SLOTS[src_cell]:
+            board.pawn_x[slot] = src_x
+            board.pawn_y[slot] = src_y
+        self.pawns_must_play["blue"] = must_play_blue
+        self.pawns_must_play["orange"] = must_play_orange
+        board.side = side
+        board.retreat = retreat
+        board.hash = hash
+
+    # Copy of the game without its data manager, small enough to be sent to the processes of a parallel search
+    # (the pawns that must play are copied with the game)
+    def search_copy(self):
+        return copy.deepcopy(self, {id(self.data_manager): None})
+
+    # 64 bits hash of the position (stacks, colors, color to move and pawns that must play)
+    def position_hash(self):
+        return self.grid.board.hash
+
+    # Check if the stack at a given position is a winning stack
+    def is_winning_stack(self, x, y):
+        return self.grid.board.height(x, y) == 4
 
     # Return the color of the pawn at the bottom of the stack
     def get_color_bottom(self, x, y, stack_value):
-        for pawn in self.pawns:
-            if pawn.x == x and pawn.y == y and pawn.type == stack_value:
-                return pawn.color
-        return None
-
-    def evaluateClassic(self, color):
-        score = 0
-        stack_multiplier = 2000  # Multiplicateur de score pour les piles
-        bonus_color = 500  # Bonus pour chaque pion de la couleur du joueur dans une pile
-        threat_multiplier = 500  # Malus pour les piles avantageuses de l'adversaire
-        opponent_color = "blue" if color == "orange" else "orange"
+        return self.grid.board.color_at(x, y, stack_value)
 
-        # Parcourir toutes les piles du plateau
-        for x in range(self.grid.size):
-            for y in range(self.grid.size):
-                stack = self.grid.grid[y][x]
-                stack_size = len(stack)
-                if stack_size > 2:
-                    base_pawn_color = self.get_color_bottom(x, y, stack[0])
-                    secondPawn_color = self.get_color_bottom(x, y, stack[1])
-                    thirdPawn_color = self.get_color_bottom(x, y, stack[2])
-                    # Attribuer des points pour les configurations avantageuses
-                    score += self.calculate_stack_scoreClassic(stack, base_pawn_color, secondPawn_color, thirdPawn_color, color, stack_multiplier, bonus_color, threat_multiplier)
+    # Sum of a score table over the cells of the board, kept up to date by the board when incremental_eval is set
+    def evaluate_table(self, table):
+        board = self.grid.board
+        if not self.incremental_eval:
+            return board.compute_score(table)
+        return board.scores[board.track(table)]
 
-        return score
+    # Sum of the scores of the stacks, each one read from the table of the color scored (see CLASSIC_SCORES)
+    def evaluateClassic(self, color):
+        return self.evaluate_table(CLASSIC_SCORES[color == "orange"])
 
     def calculate_stack_scoreClassic(self, stack, base_pawn_color, secondPawn_color, thirdPawn_color, color, stack_multiplier, bonus_color, threat_multiplier):
         stack_score = 0
@@ -339,48 +408,12 @@ class Game:
 
         return stack_score
     
+    # Same as evaluateClassic with smaller scores, weighted by the position of the stack (see CENTER_WEIGHTS)
+    # The table holds the weighted scores in tenths so that the sums stay exact in any order
     def evaluateCenter(self, color):
-        score = 0
-        stack_multiplier = 100
-        bonus_color = 50
-        threat_multiplier = 500
-        central_positions = [(2, 2), (2, 1), (2, 3), (1, 2), (3, 2)]  # Positions centrales pour la pièce 3
-        diagonal_positions = [(1, 1), (1, 3), (3, 1), (3, 3)]  # Positions diagonales pour la pièce 2
-        central_position = (2, 2)  # Position centrale pour la pièce 1
-
-        # Poids attribués aux différentes cases en fonction de leur importance stratégique
-        weight_central = 1.5  # La case centrale a un poids 1.5 fois plus important
-        weight_adjacent = 1.2  # Les cases adjacentes ont un poids 1.2 fois plus important
-        weight_diagonal = 1.1  # Les cases diagonales ont un poids 1.1 fois plus important
-
-        # Parcourir toutes les piles du plateau
-        for x in range(self.grid.size):
-            for y in range(self.grid.size):
-                stack = self.grid.grid[y][x]
-                stack_size = len(stack)
-                if stack_size > 2:
-                    base_pawn_color = self.get_color_bottom(x, y, stack[0])
-                    secondPawn_color = self.get_color_bottom(x, y, stack[1])
-                    thirdPawn_color = self.get_color_bottom(x, y, stack[2])
-                    
-                    # Calcul du score de la pile
-                    stack_score = self.calculate_stack_scoreCenter(stack, base_pawn_color, secondPawn_color, thirdPawn_color, color, stack_multiplier, bonus_color, threat_multiplier)
-                    
-                    # Appliquer les poids aux positions centrales et diagonales
-                    if (x, y) == central_position:
-                        stack_score *= weight_central
-                    elif (x, y) in central_positions:
-                        stack_score *= weight_adjacent
-                    elif (x, y) in diagonal_positions:
-                        stack_score *= weight_diagonal
-
-                    # Ajouter le score ajusté au score total
-                    score += stack_score
-
-        return score
+        return self.evaluate_table(CENTER_SCORES[color == "orange"]) / 10
 
-
-    def calculate_stack_scoreCenter(stack, base_pawn_color, secondPawn_color, thirdPawn_color, color, stack_multiplier, bonus_color, threat_multiplier):
+    def calculate_stack_scoreCenter(self, stack, base_pawn_color, secondPawn_color, thirdPawn_color, color, stack_multiplier, bonus_color, threat_multiplier):
         stack_score = 0
         bonus_color = 150
         winning_stack_bonus = 100000000  # Bonus pour une pile gagnante de 4-3-2-1
@@ -462,57 +495,86 @@ class Game:
         return stack_score
     
     def evaluateRush(self, color):
-        score = 0
-        stack_multiplier = 2000  # Score multiplier for stacks
-        winning_stack_bonus = 100000000  # Bonus for a winning stack of 4-3-2-1
+        return self.evaluate_table(RUSH_SCORES[color == "orange"])
 
+    def evaluateBlock(self, color):
+        return self.evaluate_table(BLOCK_SCORES[color == "orange"])
 
-        # Traverse all cells of the grid
-        for x in range(self.grid.size):
-            for y in range(self.grid.size):
-                stack = self.grid.grid[y][x]  # Get the stack at this cell
-                stack_values = [pawn for pawn in stack]
-                base_pawn_color = self.get_color_bottom(x, y, stack[0])
-                if base_pawn_color == color:
-                    if len(stack) == 1 and stack_values == 4:
-                        score += stack_multiplier * 1  # Priority to start the stack with a 4
-                    elif len(stack) == 2 and stack_values == [4, 3]:
-                        score += stack_multiplier * 2  # Higher priority to add a 3 on top of a 4
-                    elif len(stack) == 3 and stack_values == [4, 3, 2]:
-                        score += stack_multiplier * 3  # Even higher priority to add a 2 on top of a 4-3
-                    elif len(stack) == 4 and stack_values == [4, 3, 2, 1]:
-                        score += winning_stack_bonus  # Maximum priority and bonus for completing the stack 4-3-2-1
+    # Score of a single stack for evaluateRush, colors are the colors of the pawns of the stack (bottom first)
+    def calculate_stack_scoreRush(self, stack, colors, color):
+        stack_multiplier = 2000  # Score multiplier for stacks
+        winning_stack_bonus = 100000000  # Bonus for a winning stack of 4-3-2-1
 
-        return score
-    
-    def evaluateBlock(self, color):
+        if not stack or colors[0] != color:
+            return 0
+        stack_values = [pawn for pawn in stack]
+        if len(stack) == 2 and stack_values == [4, 3]:
+            return stack_multiplier * 2  # Higher priority to add a 3 on top of a 4
+        elif len(stack) == 3 and stack_values == [4, 3, 2]:
+            return stack_multiplier * 3  # Even higher priority to add a 2 on top of a 4-3
+        elif len(stack) == 4 and stack_values == [4, 3, 2, 1]:
+            return winning_stack_bonus  # Maximum priority and bonus for completing the stack 4-3-2-1
+        return 0
+
+    # Score of a single stack for evaluateBlock, colors are the colors of the pawns of the stack (bottom first)
+    def calculate_stack_scoreBlock(self, stack, colors, color):
         score = 0
-        blockally = 5000  
-        blockenemy = 15000  
+        blockally = 5000
+        blockenemy = 15000
         blockenemy2 = 10000
         opponent_color = "blue" if color == "orange" else "orange"
 
-        for x in range(self.grid.size):
-            for y in range(self.grid.size):
-                stack = self.grid.grid[y][x]
-                if len(stack) > 0:
-                    base_pawn_color = self.get_color_bottom(x, y, stack[0])
-                    if len(stack) > 1:
-                        top_pawn = stack[1]
-
-                        if stack[0] == 4:
-                            if top_pawn == 2 and base_pawn_color == color:
-                                score += blockally
-                            elif top_pawn == 1 and base_pawn_color == opponent_color:
-                                score += blockenemy
-                        if stack[0] == 4 and stack[1] == 3:
-                            top_pawn = stack[-1]
-
-                            if top_pawn == 1 and base_pawn_color == opponent_color:
-                                score += blockenemy2
-
+        if len(stack) > 1:
+            base_pawn_color = colors[0]
+            top_pawn = stack[1]
+            if stack[0] == 4:
+                if top_pawn == 2 and base_pawn_color == color:
+                    score += blockally
+                elif top_pawn == 1 and base_pawn_color == opponent_color:
+                    score += blockenemy
+            if stack[0] == 4 and stack[1] == 3:
+                top_pawn = stack[-1]
+                if top_pawn == 1 and base_pawn_color == opponent_color:
+                    score += blockenemy2
         return score
-   
-    
 
-                    
+
+# Weight of each square for evaluateCenter, indexed by [y][x]: 1.5 for the center, 1.2 for the squares next to it
+# and 1.1 for its diagonals
+CENTER_WEIGHTS = (
+    (1, 1, 1, 1, 1),
+    (1, 1.1, 1.2, 1.1, 1),
+    (1, 1.2, 1.5, 1.2, 1),
+    (1, 1.1, 1.2, 1.1, 1),
+    (1, 1, 1, 1, 1),
+)
+
+
+# Score of every possible cell on each square for each color, indexed by [color == "orange"][square][packed cell]
+# The packed cell holds the stack and the color of each of its pawns, so a stack is scored with one lookup
+def _build_score_tables(stack_score, weights=None):
+    tables = []
+    for color in COLORS:
+        table = []
+        for cell in range(256):
+            colors = [COLORS[slot >> 2] for slot in SLOTS[cell]]
+            table.append(stack_score(STACKS[cell & 15], colors, color))
+        table = tuple(table)
+        if weights is None:
+            tables.append((table,) * 25)
+        else:
+            tables.append(tuple(tuple(score * weights[sq // 5][sq % 5] for score in table) for sq in range(25)))
+    return tuple(tables)
+
+
+# The tables are built from the scoring rules of the evaluators (only the stacks of 3 pawns or more are scored by
+# evaluateClassic and evaluateCenter)
+_rules = Game.__new__(Game)
+CLASSIC_SCORES = _build_score_tables(
+    lambda stack, colors, color: _rules.calculate_stack_scoreClassic(stack, *colors[:3], color, 2000, 500, 500)
+    if len(stack) > 2 else 0)
+CENTER_SCORES = _build_score_tables(
+    lambda stack, colors, color: _rules.calculate_stack_scoreCenter(stack, *colors[:3], color, 100, 50, 500)
+    if len(stack) > 2 else 0, [[round(weight * 10) for weight in row] for row in CENTER_WEIGHTS])
+RUSH_SCORES = _build_score_tables(_rules.calculate_stack_scoreRush)
+BLOCK_SCORES = _build_score_tables(_rules.calculate_stack_scoreBlock)
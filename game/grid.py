@@ -1,50 +1,71 @@
 from game.env_var import *
+from game.board import Board, COLORS
 import numpy as np
 from colorama import Back
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class Grid:
     def __init__(self, size, pawns):
         self.size = size
-        self.grid = np.zeros((size, size), dtype=object)
-        for i in range(0, size):
-            for j in range(0, size):
-                self.grid[i][j] = np.array([0])
+        # Compact state of the grid, the pawns read their position from it
+        self.board = Board(size)
         self.all_pawns = pawns
+        # Pawns indexed by their slot in the pawn table of the board
+        self.pawns_by_slot = [None] * 8
         for pawn in pawns:
-            self.grid[pawn.y][pawn.x] = np.array([pawn.type])
+            pawn.bind(self.board)
+            self.pawns_by_slot[pawn.slot] = pawn
         self.aaa = []
         self.isbroken = False
 
+    # Remove every pawn from the grid, the pawns stay bound to it and must be placed again
+    def clear(self):
+        self.board.clear()
+        self.aaa = []
+        self.isbroken = False
+
+    # Object array view of the stacks (each cell is a numpy array, [0] if the cell is empty)
+    # Only built on demand, the game itself runs on self.board
+    @property
+    def grid(self):
+        grid = np.zeros((self.size, self.size), dtype=object)
+        for i in range(0, self.size):
+            for j in range(0, self.size):
+                stack = self.board.stack(j, i)
+                grid[i][j] = np.array(stack) if stack else np.array([0])
+        return grid
+
     def __getitem__(self, key):
         return self.grid[key]
 
     def display(self):
-        #print the grid with colors
-        print("------------")
-        row = ""
+        print(self.render())
+
+    # Colored text view of the grid, also used when the grid is logged (it is only built if the record is emitted)
+    def render(self):
+        lines = ["------------"]
+        row = "|"
         for i in range(0, self.size):
-            print("|", end="")
             for j in range(0, self.size):
-                if self.grid[i][j][0] != 0:
-                    for pawn in self.grid[i][j]:
-                        for pawntype in self.all_pawns:
-                            if pawntype.type == pawn and pawntype.x == j and pawntype.y == i:
-                                if pawntype.color == "blue":
-                                    row += Back.BLUE + str(pawntype.type)
-                                elif pawntype.color == "orange":
-                                    row += Back.RED + str(pawntype.type)
+                slots = self.board.slots(j, i)
+                if slots:
+                    for slot in slots:
+                        if COLORS[slot >> 2] == "blue":
+                            row += Back.BLUE + str((slot & 3) + 1)
+                        else:
+                            row += Back.RED + str((slot & 3) + 1)
                 else:
                     row += Back.BLACK + "0 "
-            print(row + Back.BLACK + "|")
-            row = ""
+            lines.append(row + Back.BLACK + "|")
+            row = "|"
+        lines.append("------------")
+        return "\n".join(lines)
 
-        print("------------")
-        
-        # easy way to print the grid
-        # for row in self.grid:
-        #     print(row)
-        # print("\n")
+    def __str__(self):
+        return self.render()
 
     # Can be used to debug, check if the grid is correct
     def checkgrid(self, round):
@@ -53,26 +74,22 @@ class Grid:
         for pawn in pawns:
             for i in range(0, self.size):
                 for j in range(0, self.size):
-                    if pawn in self.grid[j][i]:
+                    if pawn in self.board.stack(i, j):
                         counter[pawn - 1] += 1
                         if counter[pawn - 1] > 2:
                             self.aaa.append(round)
         for stat in counter:
             if stat != 2:
                 if self.aaa != []:
-                    print(self.aaa[0])
+                    logger.warning("grid broken at turn %s", self.aaa[0])
                     self.isbroken = True
 
     # Return the final stack of pawns at a given position
     def getfinalstack(self, x, y):
         final_stack = []
-        tmpobj = {}
-        for pawn in self.all_pawns:
-            if pawn.x == x and pawn.y == y:
-                tmpobj = {"color": pawn.color, "type": pawn.type, "pos": (pawn.x, pawn.y), "mouvement": pawn.mouvement}
-
-                final_stack.append(tmpobj)
-
-        final_stack.sort(key=lambda x: x["type"], reverse=True)
+        # The slots of a stack are given bottom first, so from the biggest type to the smallest
+        for slot in self.board.slots(x, y):
+            pawn = self.pawns_by_slot[slot]
+            final_stack.append({"color": pawn.color, "type": pawn.type, "pos": (x, y), "mouvement": pawn.mouvement})
 
         return final_stack
@@ -1,109 +1,123 @@
 from game.env_var import *
+from game.board import TOPS
+
+SIZE = 5
+
+
+# Cells that must be free for a pawn to go from (sx, sy) to (x, y), None if the mouvement can't reach (x, y)
+# The cells are the ones the mouvement rules have always checked: for "+" it is the ray from the pawn to the
+# destination, for "X" and "*" the diagonal part walks the columns from xsrc to xdest and the rows from ydest
+def _path(mouvement, sx, sy, x, y):
+    dx, dy = abs(sx - x), abs(sy - y)
+    if dx == 0 and dy == 0:
+        return None
+    if mouvement == "L":
+        return () if (dx, dy) in ((2, 1), (1, 2)) else None
+
+    straight = dx == 0 or dy == 0
+    diagonal = dx == dy
+    if not ((mouvement == "+" and straight) or (mouvement == "X" and diagonal) or
+            (mouvement == "*" and (straight or diagonal))):
+        return None
+
+    cells = []
+    # Row or column part (+ and * only)
+    if mouvement != "X":
+        if sy == y:
+            src, dest = (sx + 1, x) if sx < x else (x, sx - 1)
+            cells += [y * SIZE + i for i in range(src, dest + 1)]
+        else:
+            src, dest = (sy + 1, y) if sy < y else (y, sy - 1)
+            cells += [i * SIZE + x for i in range(src, dest + 1)]
+
+    # Diagonal part (X and *)
+    if mouvement != "+" and diagonal:
+        ydest, ysrc = (y, sy + 1) if sy < y else (sy - 1, y)
+        xsrc, xdest = (sx + 1, x) if sx < x else (x, sx - 1)
+        for i in range(xsrc, xdest + 1):
+            cells.append(ydest * SIZE + i)
+            if ysrc < ydest:
+                ydest -= 1
+
+    return tuple(dict.fromkeys(cells))
+
+
+# For each mouvement and each square: {destination square: cells that must be free}, destinations ordered by x then y
+def _build_move_tables():
+    tables = {}
+    for mouvement in basic_mouvements.keys():
+        squares = []
+        for sq in range(SIZE * SIZE):
+            sx, sy = sq % SIZE, sq // SIZE
+            targets = {}
+            for x in range(SIZE):
+                for y in range(SIZE):
+                    path = _path(mouvement, sx, sy, x, y)
+                    if path is not None:
+                        targets[y * SIZE + x] = path
+            squares.append(targets)
+        tables[mouvement] = tuple(squares)
+    return tables
+
+
+# For each mouvement and pawn type, tells from the type mask of a cell if the cell blocks the way
+def _build_blocking_tables():
+    tables = {}
+    for mouvement in basic_mouvements.keys():
+        for type in range(1, 5):
+            blocking = []
+            for mask in range(16):
+                top = TOPS[mask]
+                if mouvement == "+":
+                    blocking.append(top != 0)
+                elif mouvement == "X":
+                    blocking.append(top != 0 and type >= top)
+                elif mouvement == "*":
+                    blocking.append(top == 1)
+                else:
+                    blocking.append(False)
+            tables[(mouvement, type)] = tuple(blocking)
+    return tables
+
+
+# For each mouvement and each square: (x, y, destination square, cells that must be free) for the moves proposed
+# to the players, all_next_moves has never proposed a move on the row or the column of the pawn
+def _build_next_moves_tables(move_tables):
+    tables = {}
+    for mouvement, squares in move_tables.items():
+        next_moves = []
+        for sq, targets in enumerate(squares):
+            sx, sy = sq % SIZE, sq // SIZE
+            next_moves.append(tuple((dst % SIZE, dst // SIZE, dst, path) for dst, path in targets.items()
+                                    if dst % SIZE != sx and dst // SIZE != sy))
+        tables[mouvement] = tuple(next_moves)
+    return tables
+
+
+MOVE_TABLES = _build_move_tables()
+NEXT_MOVES = _build_next_moves_tables(MOVE_TABLES)
+BLOCKING = _build_blocking_tables()
+
 
 class Mouvement:
     def __init__(self):
         pass
-    
-    # Check if the mouvement is legit for each kind of mouvement    
+
+    # Check if the mouvement is legit for each kind of mouvement
     def legit_mouv(self, pawn, x, y, grid):
-        if (x < len(grid.grid) and y < len(grid.grid)) and (grid.grid[y][x][-1] > pawn.type or grid.grid[y][x][-1] == 0):
-            # Check if the pawn is moving in the right direction for L mouvs
-            if pawn.mouvement == "L":
-                if (2 == distance(pawn, x, y)[0] and 1 == distance(pawn, x, y)[1]) or (1 == distance(pawn, x, y)[0] and 2 == distance(pawn, x, y)[1]):
-                    return True
-                
-            # Check if the pawn is moving in the right direction for + mouvs
-            elif pawn.mouvement == "+":
-                if (0 != distance(pawn, x, y)[0] and 0 == distance(pawn, x, y)[1]) or (0== distance(pawn, x, y)[0] and 0 != distance(pawn, x, y)[1]):
-                    if (self.y == y):
-                        if (self.x <x):
-                            dest = max(self.x+1, x)
-                            src = min(self.x+1, x)
-                        else:
-                            dest = max(self.x-1, x)
-                            src = min(self.x-1, x)
-                        for i in range(src, dest+1):
-                            if grid.grid[y][i][-1] != 0:
-                                return False
-                    else:
-                        if (self.y <y):
-                            dest = max(self.y+1, y)
-                            src = min(self.y+1, y)
-                        else:
-                            dest = max(self.y-1, y)
-                            src = min(self.y-1, y)
-                        for i in range (src, dest+1):
-                            if grid.grid[i][x][-1] != 0:
-                                return False
-                    return True
-                
-            # Check if the pawn is moving in the right direction for X mouvs
-            elif pawn.mouvement == "X":
-                if distance(pawn, x, y)[1] == distance(pawn, x, y)[0]:
-                    if (self.y <y):
-                        ydest = max(self.y+1, y)
-                        ysrc = min(self.y+1, y)
-                    else:
-                        ydest = max(self.y-1, y)
-                        ysrc = min(self.y-1, y)
-                    if (self.x <x):
-                        xdest = max(self.x+1, x)
-                        xsrc = min(self.x+1, x)
-                    else:
-                        xdest = max(self.x-1, x)
-                        xsrc = min(self.x-1, x)
-                    
-                    for i in range (xsrc, xdest+1):
-                        if grid.grid[ydest][i][-1] != 0 and pawn.type >= grid.grid[ydest][i][-1]:
-                            return False
-                        if ysrc < ydest:
-                            ydest -= 1
-                        
-                    return True
-                
-            # Check if the pawn is moving in the right direction for * mouvs
-            elif pawn.mouvement == "*":
-                if (0 != distance(pawn, x, y)[0] and 0 == distance(pawn, x, y)[1]) or (0== distance(pawn, x, y)[0] and 0 != distance(pawn, x, y)[1]) or (distance(pawn, x, y)[1] == distance(pawn, x, y)[0]):
-                    if (self.y == y):
-                        if (self.x <x):
-                            dest = max(self.x+1, x)
-                            src = min(self.x+1, x)
-                        else:
-                            dest = max(self.x-1, x)
-                            src = min(self.x-1, x)
-                        for i in range(src, dest+1):
-                            if grid.grid[y][i][-1] == 1:
-                                return False
-                    else:
-                        if (self.y <y):
-                            dest = max(self.y+1, y)
-                            src = min(self.y+1, y)
-                        else:
-                            dest = max(self.y-1, y)
-                            src = min(self.y-1, y)
-                        for i in range (src, dest+1):
-                            if grid.grid[i][x][-1] == 1:
-                                return False
-                    
-                    if (self.y <y):
-                        ydest = max(self.y+1, y)
-                        ysrc = min(self.y+1, y)
-                    else:
-                        ydest = max(self.y-1, y)
-                        ysrc = min(self.y-1, y)
-                    if (self.x <x):
-                        xdest = max(self.x+1, x)
-                        xsrc = min(self.x+1, x)
-                    else:
-                        xdest = max(self.x-1, x)
-                        xsrc = min(self.x-1, x)
-                    
-                    for i in range (xsrc, xdest+1):
-                        if grid.grid[ydest][i][-1] == 1 and distance(pawn, x, y)[1] == distance(pawn, x, y)[0]:
-                            return False
-                        if ysrc < ydest:
-                            ydest -= 1
-                    
-                    return True
-            else:
-                return False
\ No newline at end of file
+        if x < 0 or y < 0 or x >= grid.size or y >= grid.size or pawn.x < 0 or pawn.y < 0:
+            return False
+        cells = grid.board.cells
+        # The destination must be empty or have a bigger pawn on top
+        top = TOPS[cells[y * SIZE + x] & 15]
+        if top != 0 and top <= pawn.type:
+            return False
+        # Check if the pawn is moving in the right direction and if the way is free
+        path = MOVE_TABLES[pawn.mouvement][pawn.y * SIZE + pawn.x].get(y * SIZE + x)
+        if path is None:
+            return False
+        blocking = BLOCKING[(pawn.mouvement, pawn.type)]
+        for cell in path:
+            if blocking[cells[cell] & 15]:
+                return False
+        return True
@@ -1,162 +1,121 @@
 from game.env_var import *
 from game.mouvement import Mouvement
+from game.board import slot_of, TOPS
 import numpy as np
 import copy
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class Pawn:
 
     def __init__(self, x, y, type, mouvement, color):
-        self.x = x
-        self.y = y
+        # Board holding the position of the pawn, set when the pawn is put on a grid
+        self.board = None
+        self._x = x
+        self._y = y
         if type < 5:
             self.type = type
+            self.slot = slot_of(color, type)
         self.mouvement = mouvement
         self.color = color
 
+    # The position of the pawn is stored in the pawn table of the board once the pawn is bound to it
+    @property
+    def x(self):
+        if self.board is None:
+            return self._x
+        return self.board.pawn_x[self.slot]
+
+    @x.setter
+    def x(self, value):
+        if self.board is None:
+            self._x = value
+        else:
+            self.board.pawn_x[self.slot] = value
+
+    @property
+    def y(self):
+        if self.board is None:
+            return self._y
+        return self.board.pawn_y[self.slot]
+
+    @y.setter
+    def y(self, value):
+        if self.board is None:
+            self._y = value
+        else:
+            self.board.pawn_y[self.slot] = value
+
+    # Put the pawn on a board at its current position
+    def bind(self, board):
+        x, y = self.x, self.y
+        self.board = board
+        board.place(self.slot, x, y)
+
+    # Put the pawn alone on a given position (used to place the pawns at the start of a game)
+    def place(self, x, y):
+        if self.board is None:
+            self._x, self._y = x, y
+        else:
+            self.board.place(self.slot, x, y)
+
     def move(self, x, y, grid, allpawns, game, simulate = False):
+        board = grid.board
         #fix depth 3 minmax
-        if len(grid[self.y][self.x]) == 4:
-            return np.array(grid[self.y][self.x])
+        if board.height(self.x, self.y) == 4:
+            return np.array(board.stack(self.x, self.y))
         
         #Check if the mouvement is out of grid
-        if x < 0 or x > len(grid.grid) or y < 0 or y > len(grid.grid) or (self.x == x and self.y == y):
+        if x < 0 or x > grid.size or y < 0 or y > grid.size or (self.x == x and self.y == y):
             return [False, False]
         
         # if the game is initializing, we can't play as usual
         if not game.initializing:
             #Check if the mouvement is legit
             if Mouvement.legit_mouv(self, self, x, y, grid):
-                # Calculate the stack of pawns (and if a pawn is mouved to an empty cell, the stack is the pawn itself)
-                grid.grid[y][x] = self.stack(x, y, grid, allpawns)
-                self.x = x
-                self.y = y
+                # Move the pawn (and the pawns above it) on top of the stack at the destination
+                self.stack(x, y, grid, allpawns)
                 if not simulate:
-                    grid.display()
+                    # The grid is only rendered if the record is emitted
+                    logger.debug("moving %s\n%s", self.mouvement, grid)
 
                 # Check if the game is won
-                if len(grid.grid[y][x]) == 4:
-                    if not simulate:
-                        print("moving", self.mouvement)
+                if board.height(x, y) == 4:
                     return [True, True]
                 # Check if the pawn moved successfully
                 else:
-                    if not simulate:
-                        print("moving", self.mouvement)
                     return [True, False]
                 
             # If the mouvement is not legit
             else:
                 if not simulate:
-                    print("Cant move there")
-                    print("pawn moves", self.mouvement)
+                    logger.info("Cant move there, pawn moves %s", self.mouvement)
                 return [False, False]
         else:
             if (y == 0 and self.color == "blue") or (y == 4 and self.color == "orange"):
-                grid.grid[y][x] = np.array([self.type])
-                self.x = x
-                self.y = y
+                board.place(self.slot, x, y)
                 if not simulate:
-                    grid.display()
+                    logger.debug("placing\n%s", grid)
                 return [True, False]
             else:
                 if not simulate:
-                    print("Cant move there")
-                    print("pawn moves", self.mouvement)
+                    logger.info("Cant move there, pawn moves %s", self.mouvement)
                 return [False, False]
 
 
     def display(self):
         print("-Pawn", self.color, self.type, "-  x:", self.x, "y:", self.y, "mouvement:", self.mouvement)
 
+    # Move the pawn and the pawns above it (if the pawn is in a stack) to the given position,
+    # merging them with the stack already there, and return the resulting stack
     def stack(self, x, y, grid, allpawns):
-        # Move partially the stack of pawns
-        if len(grid[self.y][self.x])>1 and self.type != grid[self.y][self.x][0]:
-            tmpid=0
-            for id in range(len(grid[self.y][self.x])):
-                if grid[self.y][self.x][id] == self.type:
-                    tmpid = id
-            stayingarr = grid[self.y][self.x].copy()
-            
-            if grid[y][x][-1] != 0:
-                goingarr = grid[y][x]
-            else:
-                goingarr = np.array([], dtype=int)
+        board = grid.board
+        top = board.top(x, y)
+        if top != 0 and top <= self.type:
+            logger.info("Cant move there definitely don't")
+            return 0
 
-            for i in range(tmpid,len(grid[self.y][self.x])):
-                if i == tmpid:
-                    goingarr = np.append(goingarr, stayingarr[i])
-                    stayingarr = np.delete(stayingarr, i)
-                else:
-                    goingarr = np.append(goingarr, stayingarr[i-1])
-                    stayingarr = np.delete(stayingarr, i-1)
-            
-            grid[self.y][self.x] = stayingarr
-            grid[y][x] = goingarr
-            
-            pawnstomove = []
-            pawnstostay = []
-            tmpxy = [self.x, self.y]
-            for pawn in allpawns:
-                if pawn.type in goingarr and pawn.x == self.x and pawn.y == self.y:
-                    pawnstomove.append(pawn)
-                if pawn.type in stayingarr and pawn.x == self.x and pawn.y == self.y:
-                    pawnstostay.append(pawn)
-            for pawn in pawnstomove:
-                pawn.x = x
-                pawn.y = y
-            for pawn in pawnstostay:
-                pawn.x = tmpxy[0]
-                pawn.y = tmpxy[1]
-                
-                    
-            return goingarr
-        
-        # Move the stack of pawns and merge the stack
-        elif len(grid[self.y][self.x])>1 and grid[y][x][-1] > self.type and self.type == grid[self.y][self.x][0]:
-            pawns=[]
-            currentstack = grid[self.y][self.x]
-            stack = grid[y][x]
-            
-            grid[self.y][self.x] = np.array([0])
-            for pawn in currentstack:
-                stack = np.append(stack, pawn)
-                
-            for pawn in allpawns:
-                if  np.isin(pawn.type, currentstack) and pawn.x == self.x and pawn.y == self.y:
-                    pawns.append(pawn)
-                    
-            for pawn in pawns:
-                pawn.x = x
-                pawn.y = y
-                
-            
-            return stack
-        
-        # Move the stack of pawns
-        elif len(grid[self.y][self.x])>1 and self.type == grid[self.y][self.x][0]:
-            tmparr = grid[self.y][self.x]
-            pawns=[]
-            grid[self.y][self.x] = np.array([0])
-            for pawn in allpawns:
-                if  np.isin(pawn.type, tmparr) and pawn.x == self.x and pawn.y == self.y:
-                    pawns.append(pawn)
-            for pawn in pawns:
-                pawn.x = x
-                pawn.y = y
-
-            return tmparr
-        
-        # Move a single pawn to an empty cell
-        elif np.array_equal(grid[y][x], np.array([0])) and len(grid[self.y][self.x]) <= 1:
-            grid[self.y][self.x] = np.array([0])
-            return np.array([self.type])
-        
-        # Move a single pawn and merge it to the stack
-        elif grid[y][x][-1] > self.type:
-            grid[self.y][self.x] = np.array([0])
-            return np.append(grid[y][x], self.type)
-        
-        else:
-            print("Cant move there definitely don't")
-            return 0
\ No newline at end of file
+        board.move(self.slot, x, y)
+        return board.stack(x, y)
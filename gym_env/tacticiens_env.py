@@ -15,10 +15,32 @@ from ai.Minimax import Minimax
 from ai.dummyAI import Dummyai
 import copy
 
+# Nombre de coups prévus au départ dans l'historique d'une partie (il double s'il est plein)
+MOVE_HISTORY_SIZE = 256
+COLOR_CODES = {'blue': 0, 'orange': 1}
+COLOR_NAMES = ('blue', 'orange')
+
+def make_opponent(opponent_type, color, game=None, time_budget=None, node_budget=None):
+    """Crée l'IA adverse: Minimax si opponent_type vaut 'minimax', aléatoire sinon"""
+    if opponent_type == 'minimax':
+        return Minimax(color, game, time_budget=time_budget, node_budget=node_budget)
+    return Dummyai(color, game)
+
 class TacticiensEnv(gym.Env):
     """Environnement OpenAI Gym pour le jeu 'Les Tacticiens de Brême'"""
 
-    def __init__(self, opponent_type='random', player_color='blue'):
+    def __init__(self, opponent_type='random', player_color='blue', opponent_time_budget=None, opponent_node_budget=None,
+                 move_log=False, opponent_ai=None):
+        """
+        Args:
+            opponent_type (str): 'random' ou 'minimax'
+            player_color (str): couleur de l'agent
+            opponent_time_budget (float): temps maximal (en secondes) par coup de l'adversaire minimax
+            opponent_node_budget (int): nombre maximal de noeuds par coup de l'adversaire minimax
+            move_log (bool): écrit aussi les coups de chaque partie dans un CSV de ./CSV/, à la fin de la partie
+                ou à l'appel de flush_move_log
+            opponent_ai: IA adverse partagée avec d'autres environnements (voir make_opponent), None pour en créer une
+        """
         super().__init__()
         # Initialisation du data manager
         self.data_manager = DataManager(False)
@@ -33,11 +55,15 @@ class TacticiensEnv(gym.Env):
         # Initialisation des attributs spécifiques à l'environnement
         self.player_color = player_color
         self.opponent_type = opponent_type
+        self.opponent_time_budget = opponent_time_budget
+        self.opponent_node_budget = opponent_node_budget
         self.opponent_color = 'orange' if player_color == 'blue' else 'blue'
         self.last_move_result = [False, False]  # [success, win]
         self.turn_counter = 0
 
-        # Initialisation du fichier de log pour les mouvements
+        # Historique des coups de la partie en mémoire: une ligne (couleur, pion, x, y, tour) par coup
+        self.move_log = move_log
+        self.move_history = np.zeros((MOVE_HISTORY_SIZE, 5), dtype=np.int16)
         self._init_move_log()
 
         # Définition de l'espace d'observation
@@ -52,49 +78,75 @@ class TacticiensEnv(gym.Env):
         self.valid_moves = []
 
         # Initialisation des IA
-        if self.opponent_type == 'minimax':
-            self.opponent_ai = Minimax(self.opponent_color, self.game)
-        else:
-            self.opponent_ai = Dummyai(self.opponent_color)
+        if opponent_ai is None:
+            opponent_ai = make_opponent(self.opponent_type, self.opponent_color, self.game, self.opponent_time_budget,
+                                        self.opponent_node_budget)
+        self.opponent_ai = opponent_ai
 
     def _init_move_log(self):
-        """Initialise le fichier de log pour les mouvements"""
+        """Vide l'historique des coups et choisit le fichier de log de la partie si move_log est activé (il n'est
+        créé qu'à la première écriture)"""
+        self.num_moves = 0
+        self.flushed_moves = 0
+        self.move_log_filename = None
+        if not self.move_log:
+            return
+
         path = "./CSV/"
         if not os.path.exists(path):
             os.makedirs(path)
 
-        self.time = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.time = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
         self.move_log_filename = f"{path}game_moves_{self.time}.csv"
 
-        with open(self.move_log_filename, mode='w', newline='') as file:
+    def _record_move(self, color, piece_type, x, y):
+        """Ajoute un coup à l'historique"""
+        if self.num_moves == len(self.move_history):
+            self.move_history = np.concatenate([self.move_history, np.zeros_like(self.move_history)])
+        self.move_history[self.num_moves] = (COLOR_CODES[color], piece_type, x, y, self.turn_counter)
+        self.num_moves += 1
+
+    def _last_move(self):
+        """Dernier coup joué, sous la forme [couleur, pion, x, y, tour] attendue par Game.isretraite"""
+        color, piece_type, x, y, turn = self.move_history[self.num_moves - 1].tolist()
+        return [COLOR_NAMES[color], piece_type, x, y, turn]
+
+    def get_move_history(self):
+        """Coups de la partie en cours, tableau (nombre de coups, 5): couleur (0 bleu, 1 orange), pion, x, y, tour"""
+        return self.move_history[:self.num_moves]
+
+    def flush_move_log(self):
+        """Écrit dans le CSV de la partie les coups qui n'y sont pas encore (si move_log est activé)"""
+        if not self.move_log or self.move_log_filename is None or self.flushed_moves == self.num_moves:
+            return
+        with open(self.move_log_filename, mode='a' if self.flushed_moves else 'w', newline='') as file:
             writer = csv.writer(file)
-            writer.writerow(["Color", "Pawn", "X", "Y", "Turn"])  # Write header row
+            if not self.flushed_moves:
+                writer.writerow(["Color", "Pawn", "X", "Y", "Turn"])  # Write header row
+            for color, piece_type, x, y, turn in self.move_history[self.flushed_moves:self.num_moves].tolist():
+                writer.writerow([COLOR_NAMES[color], piece_type, x, y, turn])
+        self.flushed_moves = self.num_moves
 
     def reset(self):
-        """Réinitialise l'environnement et retourne l'observation initiale"""
-        # Réinitialiser le data_manager
-        self.data_manager = DataManager(False)
+        """Réinitialise l'environnement et retourne l'observation initiale
 
-        # Réinitialiser le jeu
-        ai_types = (1, 1) if self.opponent_type == 'minimax' else (2, 2)
-        self.game = Game(self.data_manager, manual_mode=False, use_ai=True, ai_types=ai_types)
+        Le jeu, le data manager et l'adversaire sont réutilisés: les pions sont replacés au hasard sur la grille vidée.
+        """
+        # Commencer une nouvelle partie dans le data_manager
+        self.data_manager.new_game()
 
-        # Ajouter l'attribut initializing manquant
+        # Réinitialiser le jeu en place
+        self.game.reset()
         self.game.initializing = False
 
         # Réinitialiser les attributs
         self.last_move_result = [False, False]
         self.turn_counter = 0
 
-        # Réinitialiser le fichier de log
+        # Réinitialiser l'historique des coups (les coups de la partie précédente sont écrits avant)
+        self.flush_move_log()
         self._init_move_log()
 
-        # Réinitialiser les IA
-        if self.opponent_type == 'minimax':
-            self.opponent_ai = Minimax(self.opponent_color, self.game)
-        else:
-            self.opponent_ai = Dummyai(self.opponent_color)
-
         # Obtenir les mouvements valides
         self.valid_moves = self.game.all_next_moves(self.player_color)
 
@@ -113,6 +165,20 @@ class TacticiensEnv(gym.Env):
             done (bool): Indique si l'épisode est terminé
             info (dict): Informations supplémentaires
         """
+        result = self.step_player(action)
+        if result is not None:
+            return result
+        # Faire jouer l'adversaire
+        return self.step_opponent(self._play_opponent_move())
+
+    def step_player(self, action):
+        """
+        Joue le coup de l'agent, première moitié de step.
+
+        Returns:
+            (observation, reward, done, info) si le pas est déjà terminé (coup invalide ou victoire),
+            None si c'est à l'adversaire de jouer (voir step_opponent)
+        """
         # Mettre à jour la liste des mouvements valides si nécessaire
         if not self.valid_moves:
             self.valid_moves = self.game.all_next_moves(self.player_color)
@@ -126,25 +192,21 @@ class TacticiensEnv(gym.Env):
         color, piece_type, x, y = move
 
         # Trouver le pion à déplacer
-        for pawn in self.game.pawns:
-            if pawn.type == piece_type and pawn.color == color:
-                # Vérifier si le pion doit jouer (en cas de retraite)
-                if pawns_must_play[color] == [] or pawn in pawns_must_play[color]:
-                    ispawnmoved = pawn.move(x, y, self.game.grid, self.game.pawns, self.game)
-                    if pawns_must_play[color] and pawn in pawns_must_play[color]:
-                        pawns_must_play[color].remove(pawn)
-                else:
-                    ispawnmoved = [False, False]
-                break
+        pawn = self.game.get_pawn(color, piece_type)
+        # Vérifier si le pion doit jouer (en cas de retraite)
+        if self.game.pawns_must_play[color] == [] or pawn in self.game.pawns_must_play[color]:
+            ispawnmoved = pawn.move(x, y, self.game.grid, self.game.pawns, self.game)
+            if self.game.pawns_must_play[color] and pawn in self.game.pawns_must_play[color]:
+                self.game.pawns_must_play[color].remove(pawn)
+        else:
+            ispawnmoved = [False, False]
 
         success, win = ispawnmoved
         self.last_move_result = [success, win]
 
-        # Si le mouvement est valide, enregistrer dans le fichier de log et mettre à jour l'historique
+        # Si le mouvement est valide, enregistrer dans l'historique des coups et mettre à jour l'historique du pion
         if success:
-            with open(self.move_log_filename, mode='a', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([color, piece_type, x, y, self.turn_counter])
+            self._record_move(color, piece_type, x, y)
 
             # Mettre à jour l'historique du pion
             self.data_manager.update_pawn_history(color, piece_type, (x, y), self.turn_counter)
@@ -162,6 +224,7 @@ class TacticiensEnv(gym.Env):
                  "color": "ORANGE" if self.player_color == "blue" else "BLUE"}
             ]
             self.data_manager.write(ai, self.player_color, self.turn_counter, self.game.num_retreat, final_stack)
+            self.flush_move_log()
 
             return self._get_observation(), 100, True, {'win': True, 'valid_moves': len(self.valid_moves)}
 
@@ -170,36 +233,40 @@ class TacticiensEnv(gym.Env):
             return self._get_observation(), -1, False, {'invalid_move': True, 'valid_moves': len(self.valid_moves)}
 
         # Vérifier si le jeu est en retraite
-        with open(self.move_log_filename, mode='r', newline='') as file:
-            last_move = list(csv.reader(file))[-1]
-
-        if self.game.isretraite(last_move):
+        if self.game.isretraite(self._last_move()):
             self.game.num_retreat += 1
+        return None
 
-        # Faire jouer l'adversaire
-        opponent_move = self._play_opponent_move()
+    def step_opponent(self, opponent_move):
+        """
+        Joue le coup de l'adversaire et termine le pas commencé par step_player.
+
+        Args:
+            opponent_move (list): coup choisi par l'adversaire, None s'il ne peut pas jouer
+
+        Returns:
+            observation, reward, done, info comme step
+        """
+        success, win = self.last_move_result
         if opponent_move:
             opponent_color, opponent_piece_type, opponent_x, opponent_y = opponent_move
 
             # Trouver le pion adverse à déplacer
-            for pawn in self.game.pawns:
-                if pawn.type == opponent_piece_type and pawn.color == opponent_color:
-                    # Vérifier si le pion doit jouer (en cas de retraite)
-                    if pawns_must_play[opponent_color] == [] or pawn in pawns_must_play[opponent_color]:
-                        opponent_ispawnmoved = pawn.move(opponent_x, opponent_y, self.game.grid, self.game.pawns, self.game)
-                        if pawns_must_play[opponent_color] and pawn in pawns_must_play[opponent_color]:
-                            pawns_must_play[opponent_color].remove(pawn)
-                    else:
-                        opponent_ispawnmoved = [False, False]
-                    break
+            pawn = self.game.get_pawn(opponent_color, opponent_piece_type)
+            # Vérifier si le pion doit jouer (en cas de retraite)
+            if self.game.pawns_must_play[opponent_color] == [] or pawn in self.game.pawns_must_play[opponent_color]:
+                opponent_ispawnmoved = pawn.move(opponent_x, opponent_y, self.game.grid, self.game.pawns, self.game)
+                if self.game.pawns_must_play[opponent_color] and pawn in self.game.pawns_must_play[opponent_color]:
+                    self.game.pawns_must_play[opponent_color].remove(pawn)
+            else:
+                opponent_ispawnmoved = [False, False]
 
             opponent_success, opponent_win = opponent_ispawnmoved
 
-            # Si le mouvement de l'adversaire est valide, enregistrer dans le fichier de log et mettre à jour l'historique
+            # Si le mouvement de l'adversaire est valide, enregistrer dans l'historique des coups et mettre à jour
+            # l'historique du pion
             if opponent_success:
-                with open(self.move_log_filename, mode='a', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow([opponent_color, opponent_piece_type, opponent_x, opponent_y, self.turn_counter])
+                self._record_move(opponent_color, opponent_piece_type, opponent_x, opponent_y)
 
                 # Mettre à jour l'historique du pion
                 self.data_manager.update_pawn_history(opponent_color, opponent_piece_type, (opponent_x, opponent_y), self.turn_counter)
@@ -217,14 +284,12 @@ class TacticiensEnv(gym.Env):
                      "color": "ORANGE" if self.player_color == "blue" else "BLUE"}
                 ]
                 self.data_manager.write(ai, self.opponent_color, self.turn_counter, self.game.num_retreat, final_stack)
+                self.flush_move_log()
 
                 return self._get_observation(), -100, True, {'opponent_win': True, 'valid_moves': len(self.valid_moves)}
 
         # Vérifier si le jeu est en retraite après le mouvement de l'adversaire
-        with open(self.move_log_filename, mode='r', newline='') as file:
-            last_move = list(csv.reader(file))[-1]
-
-        if self.game.isretraite(last_move):
+        if self.game.isretraite(self._last_move()):
             self.game.num_retreat += 1
 
         # Mettre à jour la liste des mouvements valides
@@ -235,6 +300,8 @@ class TacticiensEnv(gym.Env):
 
         # Vérifier si l'épisode est terminé
         done = win or (opponent_move and opponent_win) or len(self.valid_moves) == 0 or self.game.grid.isbroken
+        if done:
+            self.flush_move_log()
 
         return self._get_observation(), reward, done, {'valid_moves': len(self.valid_moves)}
 
@@ -252,6 +319,8 @@ class TacticiensEnv(gym.Env):
 
     def _play_opponent_move(self):
         """Fait jouer l'adversaire selon le type spécifié"""
+        # L'adversaire peut être partagé avec d'autres environnements: il joue dans la partie de celui-ci
+        self.opponent_ai.game = self.game
         if self.opponent_type == 'minimax':
             # Utiliser l'IA Minimax
             move = self.opponent_ai.playsmart()
@@ -300,6 +369,6 @@ class TacticiensEnv(gym.Env):
 
     def close(self):
         """Nettoie les ressources"""
-        # Supprimer le fichier de log si nécessaire
-        if hasattr(self, 'move_log_filename') and os.path.exists(self.move_log_filename):
-            os.remove(self.move_log_filename)
\ No newline at end of file
+        # Écrire les derniers coups dans le fichier de log et les dernières parties dans le dataset si nécessaire
+        self.flush_move_log()
+        self.data_manager.close()
\ No newline at end of file
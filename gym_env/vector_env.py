@@ -0,0 +1,267 @@
+import multiprocessing
+import traceback
+
+import numpy as np
+from gym import spaces
+
+from gym_env.tacticiens_env import TacticiensEnv, make_opponent
+
+
+class TacticiensVectorEnv:
+    """N parties indépendantes de 'Les Tacticiens de Brême' jouées à chaque appel de step
+
+    Les observations sont empilées en un tableau (N, 5, 5, 8), les récompenses et les fins de partie en tableaux (N,).
+    Une partie terminée est réinitialisée automatiquement: son observation est alors celle de la nouvelle partie et
+    la dernière observation de la partie terminée est dans info['terminal_observation'].
+    Un seul adversaire choisit les coups de toutes les parties en un appel (playrandom_batch ou playsmart_batch).
+    """
+
+    def __init__(self, num_envs, opponent_type='random', player_color='blue', opponent_time_budget=None,
+                 opponent_node_budget=None):
+        """
+        Args:
+            num_envs (int): nombre de parties jouées en parallèle
+            opponent_type (str): 'random' ou 'minimax'
+            player_color (str): couleur de l'agent
+            opponent_time_budget (float): temps maximal (en secondes) par coup de l'adversaire minimax
+            opponent_node_budget (int): nombre maximal de noeuds par coup de l'adversaire minimax
+        """
+        self.num_envs = num_envs
+        # Un seul adversaire joue pour toutes les parties (elles le gardent à chaque reset)
+        opponent_color = 'orange' if player_color == 'blue' else 'blue'
+        self.opponent_ai = make_opponent(opponent_type, opponent_color, time_budget=opponent_time_budget,
+                                         node_budget=opponent_node_budget)
+        self.envs = [TacticiensEnv(opponent_type, player_color, opponent_time_budget, opponent_node_budget,
+                                   opponent_ai=self.opponent_ai)
+                     for _ in range(num_envs)]
+
+        self.single_observation_space = self.envs[0].observation_space
+        self.single_action_space = self.envs[0].action_space
+        self.observation_space = spaces.Box(low=0, high=1, shape=(num_envs, 5, 5, 8), dtype=np.int8)
+        self.action_space = spaces.MultiDiscrete([self.single_action_space.n] * num_envs)
+
+    @property
+    def valid_moves(self):
+        """Mouvements valides de chaque partie"""
+        return [env.valid_moves for env in self.envs]
+
+    def reset(self):
+        """Réinitialise toutes les parties et retourne les observations (N, 5, 5, 8)"""
+        return np.stack([env.reset() for env in self.envs])
+
+    def _play_opponent_moves(self, games):
+        """Fait choisir à l'adversaire partagé un coup pour chacune des parties, None si elle n'en a pas"""
+        if self.envs[0].opponent_type == 'minimax':
+            moves = self.opponent_ai.playsmart_batch(games)
+            return [move if move and move[1] != -1 else None for move in moves]
+        return self.opponent_ai.playrandom_batch(games)
+
+    def step(self, actions):
+        """
+        Exécute une action dans chaque partie.
+
+        Args:
+            actions (array): index du mouvement à effectuer dans chaque partie
+
+        Returns:
+            observations (np.ndarray): (N, 5, 5, 8)
+            rewards (np.ndarray): (N,)
+            dones (np.ndarray): (N,)
+            infos (list): informations de chaque partie
+        """
+        results = [env.step_player(int(action)) for env, action in zip(self.envs, actions)]
+
+        # Les parties où c'est à l'adversaire de jouer sont jouées ensemble
+        waiting = [i for i, result in enumerate(results) if result is None]
+        if waiting:
+            moves = self._play_opponent_moves([self.envs[i].game for i in waiting])
+            for i, move in zip(waiting, moves):
+                results[i] = self.envs[i].step_opponent(move)
+
+        observations = np.empty((self.num_envs, 5, 5, 8), dtype=np.int8)
+        rewards = np.empty(self.num_envs, dtype=np.float32)
+        dones = np.empty(self.num_envs, dtype=bool)
+        infos = []
+        for i, (observation, reward, done, info) in enumerate(results):
+            done = bool(done)
+            if done:
+                info['terminal_observation'] = observation
+                observation = self.envs[i].reset()
+            observations[i] = observation
+            rewards[i] = reward
+            dones[i] = done
+            infos.append(info)
+        return observations, rewards, dones, infos
+
+    def render(self, mode='human'):
+        """Affiche chaque partie"""
+        return np.stack([env.render(mode) for env in self.envs])
+
+    def close(self):
+        """Nettoie les ressources de chaque partie"""
+        for env in self.envs:
+            env.close()
+        if hasattr(self.opponent_ai, 'close'):
+            self.opponent_ai.close()
+
+
+def _worker(pipe, env_args, seed, start, stop, observations, rewards, dones, num_valid_moves):
+    """Boucle d'un processus de TacticiensSubprocVectorEnv: joue les parties start à stop et écrit leurs résultats
+    dans les tableaux partagés"""
+    # Sans graine, chaque processus tire la sienne (les processus créés par fork partagent sinon leur générateur)
+    np.random.seed(None if seed is None else seed + start)
+    observations = np.frombuffer(observations, dtype=np.int8).reshape(-1, 5, 5, 8)[start:stop]
+    rewards = np.frombuffer(rewards, dtype=np.float32)[start:stop]
+    dones = np.frombuffer(dones, dtype=np.bool_)[start:stop]
+    num_valid_moves = np.frombuffer(num_valid_moves, dtype=np.int32)[start:stop]
+    envs = None
+    try:
+        envs = TacticiensVectorEnv(stop - start, *env_args)
+        while True:
+            command, data = pipe.recv()
+            if command == 'step':
+                observations[:], rewards[:], dones[:], infos = envs.step(data)
+            elif command == 'reset':
+                observations[:] = envs.reset()
+                rewards[:] = 0
+                dones[:] = False
+                infos = None
+            elif command == 'close':
+                break
+            num_valid_moves[:] = [len(moves) for moves in envs.valid_moves]
+            pipe.send((True, infos))
+    except Exception:
+        pipe.send((False, traceback.format_exc()))
+    finally:
+        if envs is not None:
+            envs.close()
+        pipe.close()
+
+
+class TacticiensSubprocVectorEnv:
+    """N parties réparties entre K processus, chacun jouant ses parties avec un TacticiensVectorEnv
+
+    Les observations, récompenses, fins de partie et nombres de mouvements valides sont écrits par les processus
+    dans des tableaux NumPy en mémoire partagée: seules les actions et les infos passent par les pipes.
+    step_send lance un pas sans attendre, step_wait attend les résultats, ce qui permet à l'apprenant de calculer
+    ses prochaines actions pendant que les parties sont jouées.
+    """
+
+    def __init__(self, num_envs, num_workers, opponent_type='random', player_color='blue',
+                 opponent_time_budget=None, opponent_node_budget=None, copy=True, seed=None):
+        """
+        Args:
+            num_envs (int): nombre de parties jouées en parallèle
+            num_workers (int): nombre de processus (au plus num_envs)
+            opponent_type (str): 'random' ou 'minimax'
+            player_color (str): couleur de l'agent
+            opponent_time_budget (float): temps maximal (en secondes) par coup de l'adversaire minimax
+            opponent_node_budget (int): nombre maximal de noeuds par coup de l'adversaire minimax
+            copy (bool): False pour retourner directement les tableaux partagés, réécrits au pas suivant
+            seed (int): graine des placements aléatoires (None pour une graine différente à chaque fois)
+        """
+        self.num_envs = num_envs
+        self.copy = copy
+        num_workers = max(1, min(num_workers, num_envs))
+        env_args = (opponent_type, player_color, opponent_time_budget, opponent_node_budget)
+
+        self._buffers = (
+            multiprocessing.RawArray('b', num_envs * 5 * 5 * 8),
+            multiprocessing.RawArray('f', num_envs),
+            multiprocessing.RawArray('b', num_envs),
+            multiprocessing.RawArray('i', num_envs),
+        )
+        self.observations = np.frombuffer(self._buffers[0], dtype=np.int8).reshape(num_envs, 5, 5, 8)
+        self.rewards = np.frombuffer(self._buffers[1], dtype=np.float32)
+        self.dones = np.frombuffer(self._buffers[2], dtype=np.bool_)
+        # Nombre de mouvements valides de chaque partie, pour choisir les actions
+        self.num_valid_moves = np.frombuffer(self._buffers[3], dtype=np.int32)
+
+        # Parties de chaque processus: [start, stop)
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self.slices = list(zip(bounds[:-1], bounds[1:]))
+        self.pipes = []
+        self.processes = []
+        for start, stop in self.slices:
+            parent_pipe, child_pipe = multiprocessing.Pipe()
+            args = (child_pipe, env_args, seed, start, stop) + self._buffers
+            process = multiprocessing.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            child_pipe.close()
+            self.pipes.append(parent_pipe)
+            self.processes.append(process)
+        self.waiting = False
+        self.closed = False
+
+        self.single_observation_space = spaces.Box(low=0, high=1, shape=(5, 5, 8), dtype=np.int8)
+        self.single_action_space = spaces.Discrete(100)
+        self.observation_space = spaces.Box(low=0, high=1, shape=(num_envs, 5, 5, 8), dtype=np.int8)
+        self.action_space = spaces.MultiDiscrete([self.single_action_space.n] * num_envs)
+
+    def _receive(self):
+        """Attend la réponse de chaque processus et retourne leurs infos mises bout à bout"""
+        infos = []
+        errors = []
+        for pipe in self.pipes:
+            success, data = pipe.recv()
+            if not success:
+                errors.append(data)
+            elif data is not None:
+                infos.extend(data)
+        self.waiting = False
+        if errors:
+            raise RuntimeError("Erreur dans un processus de l'environnement:\n" + errors[0])
+        return infos
+
+    def _results(self, *arrays):
+        return tuple(array.copy() for array in arrays) if self.copy else arrays
+
+    def reset(self):
+        """Réinitialise toutes les parties et retourne les observations (N, 5, 5, 8)"""
+        for pipe in self.pipes:
+            pipe.send(('reset', None))
+        self._receive()
+        return self._results(self.observations)[0]
+
+    def step_send(self, actions):
+        """Lance un pas dans chaque partie sans attendre les résultats (voir step_wait)"""
+        if self.waiting:
+            raise RuntimeError("step_wait doit être appelé avant un nouveau step_send")
+        actions = np.asarray(actions)
+        for pipe, (start, stop) in zip(self.pipes, self.slices):
+            pipe.send(('step', actions[start:stop]))
+        self.waiting = True
+
+    def step_wait(self):
+        """
+        Attend la fin du pas lancé par step_send.
+
+        Returns:
+            observations (np.ndarray): (N, 5, 5, 8)
+            rewards (np.ndarray): (N,)
+            dones (np.ndarray): (N,)
+            infos (list): informations de chaque partie
+        """
+        if not self.waiting:
+            raise RuntimeError("step_send doit être appelé avant step_wait")
+        infos = self._receive()
+        return self._results(self.observations, self.rewards, self.dones) + (infos,)
+
+    def step(self, actions):
+        """Exécute une action dans chaque partie, comme TacticiensVectorEnv.step"""
+        self.step_send(actions)
+        return self.step_wait()
+
+    def close(self):
+        """Arrête les processus, qui nettoient les ressources de leurs parties"""
+        if self.closed:
+            return
+        if self.waiting:
+            self._receive()
+        for pipe in self.pipes:
+            pipe.send(('close', None))
+        for process in self.processes:
+            process.join()
+        for pipe in self.pipes:
+            pipe.close()
+        self.closed = True
@@ -1,4 +1,5 @@
 import os
+import logging
 from data.data_manager import DataManager
 from game.env_var import *
 from game.game import Game
@@ -11,9 +12,15 @@ from datetime import datetime
 manual_mode = True     # True if we want to place the pawns manually, False if we want to place them randomly
 use_ai = True           # True if we want to use AI, False if we want to play manually
 ai_types = (1, 1)       # 1 for Minimax, 2 for random AI
+workers = 1             # Number of processes used by each Minimax AI to search its moves
+log_level = logging.INFO  # One summary per game, logging.DEBUG to also show each move and the grid after it,
+                          # logging.WARNING for silent runs
+
+logger = logging.getLogger(__name__)
 
 
 def main():
+    logging.basicConfig(level=log_level, format="%(message)s")
     # Initialize the data manager
     # Note: if you want to overwrite an existing CSV file, set the overwrite parameter to True
     # and the url to the path of the file to overwrite
@@ -31,7 +38,7 @@ def main():
     while loop > 0:
         if loop < 500:
             game.reset()
-        print(loop)
+        logger.info("%s", loop)
         loop -= 1
 
         is_ai = game.use_ai
@@ -41,20 +48,20 @@ def main():
 
         if game.use_ai:
             if game.ai_types[0] == 1 and game.ai_types[1] == 1:
-                aiblue = Minimax("blue", game)
-                aiorange = Minimax("orange", game)
+                aiblue = Minimax("blue", game, workers=workers)
+                aiorange = Minimax("orange", game, workers=workers)
             elif game.ai_types[0] == 1 and game.ai_types[1] == 2:
-                aiblue = Minimax("blue", game)
-                aiorange = Dummyai("orange")
+                aiblue = Minimax("blue", game, workers=workers)
+                aiorange = Dummyai("orange", game)
             elif game.ai_types[0] == 2 and game.ai_types[1] == 1:
-                aiblue = Dummyai("blue")
-                aiorange = Minimax("orange", game)
+                aiblue = Dummyai("blue", game)
+                aiorange = Minimax("orange", game, workers=workers)
             elif game.ai_types[0] == 2 and game.ai_types[1] == 2:
-                aiblue = Dummyai("blue")
-                aiorange = Dummyai("orange")
+                aiblue = Dummyai("blue", game)
+                aiorange = Dummyai("orange", game)
             else:
-                aiblue = Minimax("blue", game)
-                aiorange = Minimax("orange", game)
+                aiblue = Minimax("blue", game, workers=workers)
+                aiorange = Minimax("orange", game, workers=workers)
 
         # Create a new CSV file for recording moves
         path = "./CSV/"
@@ -68,8 +75,8 @@ def main():
         while True:
             counterinit = 0
             if game.grid.isbroken:
-                print("game is broken")
-                print("Game ended in", counter, "turns")
+                logger.warning("game is broken")
+                logger.warning("Game ended in %s turns", counter)
                 for pawn in game.pawns:
                     pawn.display()
                 break
@@ -87,7 +94,7 @@ def main():
                     counterinit += 1
                     
             if counterinit == 8:
-                print("finish initialisation of the game")
+                logger.info("finish initialisation of the game")
                 game.initializing = False
             if game.initializing == False:
                 game.grid.checkgrid(counter)
@@ -105,18 +112,18 @@ def main():
             if game.use_ai:
                 ai = aiblue if color == "blue" else aiorange
                 if ai.type == "M":
-                    print("MINMAX AI")
+                    logger.debug("MINMAX AI")
                     move = ai.playsmart()  # Obtenir le meilleur mouvement de l'IA
                     if move:
                         if move[1] == -1 : # or counter > 200:
                             os.remove(move_log_filename)
                             loop += 1
                             break
-                        print(f"AI {color} chooses to move pawn {move[1]} to ({move[2]}, {move[3]})")
+                        logger.debug("AI %s chooses to move pawn %s to (%s, %s)", color, move[1], move[2], move[3])
                         # On met à jour l'historique du pion
                         data_manager.update_pawn_history(color, move[1], (move[2], move[3]), counter)
                 else:
-                    print("RANDOM AI")
+                    logger.debug("RANDOM AI")
                     move = ai.playrandom(game.all_next_moves(color))
                     # if move is None:
                     #     os.remove(move_log_filename)
@@ -127,12 +134,11 @@ def main():
                         pawn_to_move = move[1]
                         x = move[2]
                         y = move[3]
-                        print(f"RANDOMAI {color} chooses to move pawn {pawn_to_move} to ({x}, {y})")
+                        logger.debug("RANDOMAI %s chooses to move pawn %s to (%s, %s)", color, pawn_to_move, x, y)
                         # On met à jour l'historique du pion
                         data_manager.update_pawn_history(color, move[1], (move[2], move[3]), counter)
                     except:
-                        print("No moves available")
-                        game.grid.display()
+                        logger.debug("No moves available\n%s", game.grid)
                         loop = 0
                         break
             else:
@@ -152,28 +158,28 @@ def main():
                     # stocker l'état de la grille car situation bloquante pour un joueur
                     break
                 # Vérifier si le pion à déplacer est dans la liste des pions qui doivent jouer
-                for pawn in game.pawns:
-                    if pawn.type == pawn_to_move and pawn.color == color:
-                        if pawns_must_play[color] == []:
+                pawn = game.get_pawn(color, pawn_to_move)
+                if pawn is not None:
+                    if game.pawns_must_play[color] == []:
+                        ispawnmoved = pawn.move(x, y, game.grid, game.pawns, game)
+                    else:
+                        if pawn in game.pawns_must_play[color]:
                             ispawnmoved = pawn.move(x, y, game.grid, game.pawns, game)
+                            game.pawns_must_play[color].remove(pawn)
                         else:
-                            if pawn in pawns_must_play[color]:
-                                ispawnmoved = pawn.move(x, y, game.grid, game.pawns, game)
-                                pawns_must_play[color].remove(pawn)
-                            else:
-                                #print(
-                                #    "You must play with the pawn(s) that is in the retraite area. \nPawns in the retraite area:",
-                                #    ' and '.join([str(lst.type) for lst in pawns_must_play[color]]))
-                                ispawnmoved = [False, False]
+                            #print(
+                            #    "You must play with the pawn(s) that is in the retraite area. \nPawns in the retraite area:",
+                            #    ' and '.join([str(lst.type) for lst in game.pawns_must_play[color]]))
+                            ispawnmoved = [False, False]
                 if ispawnmoved[0]:
                     with open(move_log_filename, mode='a', newline='') as file:
                         writer = csv.writer(file)
                         writer.writerow([color, pawn_to_move, x, y, counter])  # Write move to CSV file
                 # Check if the game is won by a player
                 if ispawnmoved[1]:
-                    print("Game Over")
-                    print("And the winner is......", color, "!!!")
-                    print("Game ended in", counter, "turns")
+                    logger.info("Game Over")
+                    logger.info("And the winner is...... %s !!!", color)
+                    logger.info("Game ended in %s turns", counter)
                     final_stack = game.grid.getfinalstack(x, y)
                     ai = [
                         {"type": aiblue.type, "depth": aiblue.base_depth if aiblue.type == "M" else None,
@@ -193,9 +199,15 @@ def main():
                 if ispawnmoved[0]:
                     counter += 1
 
+        # Stop the search processes of the AIs of this game
+        if game.use_ai:
+            for ai in (aiblue, aiorange):
+                if ai.type == "M":
+                    ai.close()
+
     end_time = datetime.now().strftime("%Y%m%d_%H%M%S")
     duration = datetime.strptime(end_time, "%Y%m%d_%H%M%S") - datetime.strptime(start_time, "%Y%m%d_%H%M%S")
-    print("Duration:", duration)
+    logger.info("Duration: %s", duration)
 
 
 if __name__ == "__main__":
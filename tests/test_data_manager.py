@@ -0,0 +1,186 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Ajouter le répertoire parent au chemin pour pouvoir importer les modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.data_manager import DataManager, COLUMNS
+from data import records
+
+FINAL_STACK = [{"color": "orange", "type": 4, "pos": (1, 2), "mouvement": "+"},
+               {"color": "blue", "type": 1, "pos": (1, 2), "mouvement": "*"}]
+
+
+def write_game(data_manager, turn):
+    """Écrit une partie minimale dans le data manager"""
+    data_manager.set_initial_pos("blue", 1, (0, 2))
+    data_manager.set_initial_pos("orange", 4, (3, 4))
+    data_manager.update_pawn_history("orange", 4, (3, 3), 1)
+    # Le coup bleu dépend du nombre de tours, pour que les parties diffèrent
+    data_manager.update_pawn_history("blue", 1, (turn % 5, 2), 0)
+    ai = [{"type": "R", "depth": None, "color": "BLUE"}, {"type": "R", "depth": None, "color": "ORANGE"}]
+    data_manager.write(ai, "blue", turn, 0, FINAL_STACK)
+
+
+def count_lines(file_name):
+    if not os.path.exists(file_name):
+        return 0
+    with open(file_name) as file:
+        return sum(1 for _ in file)
+
+
+def test_append_only_write(tmp_path):
+    """Les parties sont ajoutées à la fin du fichier, par lots de buffer_size, sans réécrire le fichier"""
+    file_name = str(tmp_path / "games.csv")
+    data_manager = DataManager(True, file_name, buffer_size=2)
+    # Le fichier n'est créé qu'avec la première partie écrite
+    assert not os.path.exists(file_name)
+
+    write_game(data_manager, 10)
+    assert count_lines(file_name) == 0
+    write_game(data_manager, 11)
+    assert count_lines(file_name) == 3  # en-tête + 2 parties
+    write_game(data_manager, 12)
+    assert count_lines(file_name) == 3
+    data_manager.flush()
+    assert count_lines(file_name) == 4
+
+    # Un nouveau data manager sur le même fichier ajoute ses parties sans répéter l'en-tête
+    data_manager = DataManager(True, file_name, fsync=True)
+    write_game(data_manager, 13)
+    df = pd.read_csv(file_name)
+    assert list(df.columns) == COLUMNS
+    assert list(df["turn"]) == [10, 11, 12, 13]
+    assert df["final_stack"][0] == str(FINAL_STACK)
+    assert data_manager.df.equals(df)
+
+
+def test_records(tmp_path):
+    """Le stockage en colonnes contient les parties du CSV, qu'il soit écrit par le data manager ou converti"""
+    file_name = str(tmp_path / "games.csv")
+    root = str(tmp_path / "records")
+    data_manager = DataManager(True, file_name, buffer_size=2, record_root=root, record_chunk_size=2)
+    for turn in (10, 11, 12):
+        write_game(data_manager, turn)
+    data_manager.flush()
+    # Un morceau par record_chunk_size parties, le reste n'est écrit qu'à la fermeture
+    assert len(records.list_chunks(root)) == 1
+    data_manager.close()
+    assert len(records.list_chunks(root)) == 2
+
+    games, moves = records.load_records(root)
+    assert list(games["game_id"]) == [0, 1, 2]
+    assert list(games["turn"]) == [10, 11, 12]
+    assert list(games["winner"]) == [0, 0, 0]
+    assert [records.AI_TYPES[ai] for ai in games["blue_ai"]] == ["R"] * 3
+    assert list(games["initial_x"][0]) == [0, -1, -1, -1, -1, -1, -1, 3]
+    assert list(games["final_type"][0]) == [4, 1, 0, 0]
+    assert list(games["final_color"][0]) == [1, 0, -1, -1]
+    # Coups triés par partie puis par tour, move_start indexe la table des coups
+    assert list(moves["game_id"]) == [0, 0, 1, 1, 2, 2]
+    assert list(moves["turn"]) == [0, 1] * 3
+    start = games["move_start"][2]
+    assert list(moves["color"][start:start + games["num_moves"][2]]) == [0, 1]
+
+    # La conversion du CSV donne les mêmes tables, en un seul morceau lu en mémoire partagée
+    converted = str(tmp_path / "converted")
+    assert records.convert_csv(file_name, converted) == 3
+    converted_games, converted_moves = records.load_records(converted)
+    assert isinstance(converted_games["turn"], np.memmap)
+    for column in records.GAME_COLUMNS:
+        assert np.array_equal(converted_games[column], games[column])
+    for column in records.MOVE_COLUMNS:
+        assert np.array_equal(converted_moves[column], moves[column])
+
+
+def test_record_chunks(tmp_path):
+    """Le nombre de morceaux du stockage dépend de record_chunk_size, pas du nombre d'écritures du CSV"""
+    file_name = str(tmp_path / "games.csv")
+    root = str(tmp_path / "records")
+    data_manager = DataManager(True, file_name, record_root=root, record_chunk_size=10)
+    for turn in range(25):
+        write_game(data_manager, turn)
+    assert len(pd.read_csv(file_name)) == 25
+    assert len(records.list_chunks(root)) == 2
+    data_manager.close()
+    assert len(records.list_chunks(root)) == 3
+    assert records.num_games(root) == 25
+    games, moves = records.load_records(root)
+    assert list(games["turn"]) == list(range(25))
+
+
+def test_vectorized_analytics(tmp_path):
+    """Les analyses vectorisées donnent les mêmes résultats que get_grid_occupation et count_stack_by_color"""
+    import ast
+    from data import functions
+
+    file_name = str(tmp_path / "games.csv")
+    data_manager = DataManager(True, file_name)
+    for turn in (10, 11, 12):
+        write_game(data_manager, turn)
+    other_file_name = str(tmp_path / "other_games.csv")
+    data_manager = DataManager(True, other_file_name)
+    write_game(data_manager, 13)
+
+    df = pd.concat([pd.read_csv(file_name), pd.read_csv(other_file_name)], ignore_index=True)
+    for column in records.PAWN_COLUMNS + ("final_stack",):
+        df[column] = df[column].apply(ast.literal_eval)
+
+    occupations = functions.get_grid_occupations([file_name, other_file_name])
+    assert list(occupations)[0] == ("RR", "blue", "rooster")
+    assert occupations[("RR", "blue", "rooster")].equals(functions.get_grid_occupation(df, "rooster", "blue"))
+    assert occupations[("RR", "orange", "donkey")].equals(functions.get_grid_occupation(df, "donkey", "orange"))
+    assert functions.get_grid_occupations(str(tmp_path), by=())[()].equals(functions.get_grid_occupation(df))
+
+    games, _ = functions.load_tables(str(tmp_path))
+    same_color = df["final_stack"].apply(functions.count_stack_by_color)
+    assert list(functions.get_stacks_of_one_color(games)) == list(same_color)
+    counts = functions.count_stacks_by_color(str(tmp_path))
+    assert counts.loc[("RR", "blue")].tolist() == [4, 0]
+
+
+def test_consolidate(tmp_path):
+    """La consolidation ignore les fichiers vides, garde une seule fois les parties en double et les indexe"""
+    from data import consolidate
+
+    dataset = tmp_path / "dataset"
+    dataset.mkdir()
+    data_manager = DataManager(True, str(dataset / "game_a.csv"))
+    for turn in (10, 41, 12):
+        write_game(data_manager, turn)
+    # Même première partie que game_a.csv, puis une partie gagnée par orange
+    data_manager = DataManager(True, str(dataset / "game_b.csv"))
+    write_game(data_manager, 10)
+    data_manager.set_initial_pos("blue", 1, (4, 0))
+    data_manager.write([{"type": "M", "depth": 4, "color": "BLUE"}, {"type": "M", "depth": 4, "color": "ORANGE"}],
+                       "orange", 20, 1, FINAL_STACK)
+    # Fichier vide laissé par un environnement
+    (dataset / "game_c.csv").write_text(",".join(COLUMNS) + "\n")
+
+    root = str(tmp_path / "records")
+    assert consolidate.consolidate(str(dataset), root) == 4
+    games, _ = records.load_records(root)
+    assert list(games["turn"]) == [10, 41, 12, 20]
+
+    index = consolidate.load_index(root)
+    assert list(index["sources"]) == ["game_a.csv", "game_b.csv"]
+    assert list(consolidate.query(index, matchup="RR", winner="blue", max_turn=30)) == [0, 2]
+    assert list(consolidate.query(index, matchup="RR", min_turn=30)) == [1]
+    assert list(consolidate.query(index, matchup="M44")) == [3]
+    assert list(consolidate.query(index, winner="orange", source="game_b.csv")) == [3]
+    assert list(consolidate.query(index, source="game_b.csv")) == [3]
+    assert list(consolidate.query(index, matchup="M22")) == []
+
+    # Le nom complet du type d'IA est gardé, e.g. l'agent DQN de l'environnement
+    games, _ = records.records_from_games([{
+        "ai": [{"type": "DQN", "depth": None, "color": "BLUE"}, {"type": "M", "depth": 4, "color": "ORANGE"}],
+        "victory": "BLUE", "turn": 5, "retreat": 0, "initial_pos": [], "final_stack": FINAL_STACK,
+        "donkey": [], "dog": [], "cat": [], "rooster": []}])
+    assert list(records.matchups(games)) == ["DQNM4"]
+
+    # Une nouvelle consolidation remplace le stockage
+    assert consolidate.consolidate(str(dataset), root) == 4
+    assert len(records.list_chunks(root)) == 1
@@ -63,6 +63,146 @@ def test_full_episode():
     env.close()
     return steps, total_reward
 
+def test_env_silent(capsys):
+    """Par défaut l'environnement n'écrit rien sur la sortie standard"""
+    for opponent_type in ('random', 'minimax'):
+        env = TacticiensEnv(opponent_type=opponent_type)
+        env.reset()
+        for _ in range(10):
+            if len(env.valid_moves) == 0:
+                break
+            _, _, done, _ = env.step(np.random.randint(0, len(env.valid_moves)))
+            if done:
+                break
+        env.close()
+    assert capsys.readouterr().out == ""
+
+def test_move_history():
+    """Les coups sont gardés en mémoire, le CSV n'est écrit que si move_log est activé, à la demande ou à la fin"""
+    import csv
+
+    def play(env, steps):
+        """Joue au plus steps coups aléatoires, retourne True si la partie est terminée"""
+        for _ in range(steps):
+            _, _, done, _ = env.step(np.random.randint(0, len(env.valid_moves)))
+            if done:
+                return True
+        return False
+
+    np.random.seed(0)
+    env = TacticiensEnv(opponent_type='random')
+    env.reset()
+    assert env.move_log_filename is None
+    play(env, 5)
+    history = env.get_move_history()
+    assert history.shape == (env.num_moves, 5) and env.num_moves >= 2
+    assert (history[:, 4] == np.arange(env.num_moves)).all()
+    env.close()
+
+    env = TacticiensEnv(opponent_type='random', move_log=True)
+    filename = None
+    try:
+        env.reset()
+        filename = env.move_log_filename
+        if play(env, 5):
+            # La partie terminée a déjà écrit tous ses coups
+            assert env.flushed_moves == env.num_moves
+        else:
+            assert not os.path.exists(filename)  # rien n'est écrit avant la fin de la partie ou flush_move_log
+        env.flush_move_log()
+        with open(filename, newline='') as file:
+            rows = list(csv.reader(file))[1:]
+        assert [[int(value) for value in row[1:]] for row in rows] == env.get_move_history()[:, 1:].tolist()
+        assert rows[-1][0] == env._last_move()[0]
+        env.close()
+    finally:
+        if filename is not None and os.path.exists(filename):
+            os.remove(filename)
+
+def test_vector_env():
+    """L'environnement vectorisé joue N parties par appel et réinitialise les parties terminées"""
+    from gym_env.vector_env import TacticiensVectorEnv
+    for opponent_type in ('random', 'minimax'):
+        envs = TacticiensVectorEnv(3, opponent_type=opponent_type, opponent_node_budget=200)
+        obs = envs.reset()
+        assert obs.shape == (3, 5, 5, 8)
+        assert all(env.opponent_ai is envs.opponent_ai for env in envs.envs)
+        for _ in range(20):
+            actions = [np.random.randint(0, len(moves)) if moves else 0 for moves in envs.valid_moves]
+            obs, rewards, dones, infos = envs.step(actions)
+            assert obs.shape == (3, 5, 5, 8) and rewards.shape == (3,) and dones.shape == (3,)
+
+        # Fin de partie forcée pour la deuxième partie: elle est réinitialisée dans le même appel
+        env = envs.envs[1]
+        env.step_player = lambda action: (env._get_observation(), 100, True, {'win': True})
+        obs, rewards, dones, infos = envs.step([0, 0, 0])
+        assert list(dones) == [False, True, False] and rewards[1] == 100
+        assert infos[1]['terminal_observation'].shape == (5, 5, 8)
+        # La partie recommence: les 8 pions sont sur le plateau, chacun dans sa propre case
+        assert env.turn_counter == 0 and env.num_moves == 0
+        assert obs[1].sum() == 8 and obs[1].sum(axis=2).max() == 1
+        assert all(env.opponent_ai is envs.opponent_ai for env in envs.envs)
+
+        # Une partie jouée seule fait jouer l'adversaire partagé dans sa propre partie
+        env = envs.envs[2]
+        env._play_opponent_move()
+        assert envs.opponent_ai.game is env.game
+        envs.close()
+
+def test_subproc_vector_env():
+    """Les parties jouées dans des processus écrivent leurs résultats dans la mémoire partagée"""
+    from gym_env.vector_env import TacticiensSubprocVectorEnv
+    envs = TacticiensSubprocVectorEnv(4, 2, seed=0)
+    try:
+        obs = envs.reset()
+        assert obs.shape == (4, 5, 5, 8) and (obs.sum(axis=(1, 2, 3)) == 8).all()
+        # Les deux processus ont leur propre graine: les placements diffèrent
+        assert not (obs[0] == obs[2]).all() or not (obs[1] == obs[3]).all()
+        assert (envs.num_valid_moves > 0).all()
+        for _ in range(10):
+            actions = np.random.randint(0, envs.num_valid_moves)
+            envs.step_send(actions)
+            obs, rewards, dones, infos = envs.step_wait()
+            assert obs.shape == (4, 5, 5, 8) and rewards.shape == (4,) and dones.shape == (4,)
+            assert len(infos) == 4
+            assert obs is not envs.observations
+    finally:
+        envs.close()
+
+def test_subproc_vector_env_dataset(tmp_path, monkeypatch):
+    """Chaque processus écrit les parties terminées dans son propre CSV: un seul en-tête et des lignes entières"""
+    import glob
+    import pandas as pd
+    from data import records
+    from data.data_manager import COLUMNS
+    from gym_env.vector_env import TacticiensSubprocVectorEnv
+    # Les processus héritent du répertoire courant: le dataset est écrit dans tmp_path
+    monkeypatch.chdir(tmp_path)
+    envs = TacticiensSubprocVectorEnv(4, 2, seed=3)
+    rng = np.random.RandomState(3)
+    finished = np.zeros(4, dtype=int)
+    try:
+        envs.reset()
+        # Jusqu'à ce que chaque processus ait terminé au moins une partie
+        for _ in range(5000):
+            obs, rewards, dones, infos = envs.step(rng.randint(0, envs.num_valid_moves))
+            finished += dones
+            if all(finished[start:stop].sum() for start, stop in envs.slices):
+                break
+    finally:
+        envs.close()
+    assert all(finished[start:stop].sum() for start, stop in envs.slices)
+
+    file_names = glob.glob(str(tmp_path / "data" / "dataset" / "*.csv"))
+    assert len(file_names) == len(envs.slices)
+    for file_name in file_names:
+        with open(file_name) as file:
+            assert file.read().count(",".join(COLUMNS)) == 1
+        assert list(pd.read_csv(file_name).columns) == COLUMNS
+    games, moves = records.read_csv(file_names)
+    assert len(games["game_id"]) == finished.sum()
+    assert (games["num_moves"] > 0).all()
+
 if __name__ == "__main__":
     print("Test des fonctionnalités de base de l'environnement...")
     test_env_basics()
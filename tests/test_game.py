@@ -0,0 +1,339 @@
+import sys
+import os
+import random
+import numpy as np
+
+# Ajouter le répertoire parent au chemin pour pouvoir importer les modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.env_var import *
+from game.game import Game
+from game.grid import Grid
+from game.mouvement import Mouvement, MOVE_TABLES
+from game.pawn import Pawn
+
+
+def make_pawns(blue_x=(0, 1, 2, 3), orange_x=(0, 1, 2, 3)):
+    """Crée les 8 pions, les bleus sur la ligne 0 et les oranges sur la ligne 4"""
+    mouvs = list(basic_mouvements.keys())
+    pawns = []
+    for i, x in enumerate(blue_x):
+        pawns.append(Pawn(x, 0, i + 1, mouvs[i], "blue"))
+    for i, x in enumerate(orange_x):
+        pawns.append(Pawn(x, 4, i + 1, mouvs[i], "orange"))
+    return pawns
+
+
+def test_board_matches_pawns():
+    """La grille compacte contient chaque pion à sa position"""
+    pawns = make_pawns()
+    grid = Grid(5, pawns)
+    for pawn in pawns:
+        assert grid.board.stack(pawn.x, pawn.y) == (pawn.type,)
+        assert grid.board.color_at(pawn.x, pawn.y, pawn.type) == pawn.color
+    assert grid.board.stack(4, 2) == ()
+    assert list(grid.grid[0][0]) == [1]
+    assert list(grid.grid[2][2]) == [0]
+
+
+def test_board_stack_moves():
+    """Déplacer un pion emporte les pions au-dessus de lui"""
+    pawns = make_pawns()
+    grid = Grid(5, pawns)
+    board = grid.board
+    blue = {pawn.type: pawn for pawn in pawns if pawn.color == "blue"}
+    orange = {pawn.type: pawn for pawn in pawns if pawn.color == "orange"}
+
+    board.move(orange[3].slot, 2, 2)
+    board.move(blue[2].slot, 2, 2)
+    board.move(orange[1].slot, 2, 2)
+    assert board.stack(2, 2) == (3, 2, 1)
+    assert [board.color_at(2, 2, t) for t in (3, 2, 1)] == ["orange", "blue", "orange"]
+
+    # Le chat bleu part avec le coq orange, le chien orange reste
+    board.move(blue[2].slot, 3, 3)
+    assert board.stack(2, 2) == (3,)
+    assert board.stack(3, 3) == (2, 1)
+    assert (orange[1].x, orange[1].y) == (3, 3)
+    assert (orange[3].x, orange[3].y) == (2, 2)
+    assert board.top(3, 3) == 1 and board.height(3, 3) == 2
+
+
+class NoRecord:
+    """Remplace le DataManager pour ne pas écrire de fichier pendant les tests"""
+    def set_initial_pos(self, color, _type, pos):
+        pass
+
+
+def make_game(seed=0):
+    np.random.seed(seed)
+    game = Game(NoRecord(), manual_mode=False, use_ai=True, ai_types=(1, 1))
+    game.initializing = False
+    return game
+
+
+def random_playout(game, rng, turns, stacking=False):
+    """Joue au plus turns coups aléatoires, bleu commence, en préférant les empilements si stacking.
+    Donne (couleur, coup, jeton de undo_move) après chaque coup, s'arrête sur une pile gagnante ou sans coup possible"""
+    color = "blue"
+    for _ in range(turns):
+        moves = game.all_next_moves(color)
+        if not moves:
+            return
+        if stacking:
+            moves = [move for move in moves if game.grid.board.top(move[2], move[3])] or moves
+        move = rng.choice(moves)
+        yield color, move, game.apply_move(move)
+        if game.is_winning_stack(move[2], move[3]):
+            return
+        color = "orange" if color == "blue" else "blue"
+
+
+def play_random_moves(game, turns, seed=0):
+    """Joue des coups aléatoires et retourne la couleur qui doit jouer"""
+    color = "blue"
+    for played, _, _ in random_playout(game, random.Random(seed), turns):
+        color = "orange" if played == "blue" else "blue"
+    return color
+
+
+def snapshot(game):
+    board = game.grid.board
+    return (list(board.cells), list(board.pawn_x), list(board.pawn_y),
+            list(game.pawns_must_play["blue"]), list(game.pawns_must_play["orange"]))
+
+
+def test_apply_undo_restores_game():
+    """apply_move puis undo_move remet la partie exactement dans son état"""
+    rng = random.Random(0)
+    for seed in range(5):
+        game = make_game(seed)
+        tokens = []
+        states = [snapshot(game)]
+        for _, _, token in random_playout(game, rng, 30):
+            tokens.append(token)
+            states.append(snapshot(game))
+        while tokens:
+            states.pop()
+            game.undo_move(tokens.pop())
+            assert snapshot(game) == states[-1]
+
+
+def test_move_tables():
+    """Les tables précalculées donnent les bonnes destinations"""
+    # Cavalier dans un coin: deux destinations, sans case à traverser
+    assert MOVE_TABLES["L"][0] == {7: (), 11: ()}
+    # Tour: le rayon va jusqu'à la destination incluse
+    assert MOVE_TABLES["+"][0][3] == (1, 2, 3)
+    assert MOVE_TABLES["+"][0][15] == (5, 10, 15)
+    assert 6 not in MOVE_TABLES["+"][0]
+
+    pawns = make_pawns(blue_x=(0, 1, 2, 4), orange_x=(0, 1, 2, 3))
+    grid = Grid(5, pawns)
+    donkey = [pawn for pawn in pawns if pawn.color == "blue" and pawn.type == 4][0]
+    assert Mouvement.legit_mouv(donkey, donkey, 4, 3, grid)
+    assert not Mouvement.legit_mouv(donkey, donkey, 3, 1, grid)
+    # Un pion sur le chemin bloque l'âne
+    rooster = [pawn for pawn in pawns if pawn.color == "orange" and pawn.type == 1][0]
+    grid.board.move(rooster.slot, 4, 2)
+    assert Mouvement.legit_mouv(donkey, donkey, 4, 1, grid)
+    assert not Mouvement.legit_mouv(donkey, donkey, 4, 3, grid)
+
+
+def test_next_moves_generator():
+    """Le générateur donne les mêmes coups que le parcours de toutes les cases"""
+    def check_moves(game, color):
+        expected = []
+        for pawn in game.pawns:
+            for x in range(5):
+                for y in range(5):
+                    must_play = game.pawns_must_play[color]
+                    if pawn.color == color and pawn.x != x and pawn.y != y and \
+                            (must_play == [] or pawn in must_play) and \
+                            Mouvement.legit_mouv(pawn, pawn, x, y, game.grid):
+                        expected.append([pawn.color, pawn.type, x, y])
+        assert list(game.iter_next_moves(color)) == expected
+        assert game.all_next_moves(color) == expected
+
+    game = make_game(3)
+    check_moves(game, "blue")
+    for color, _, _ in random_playout(game, random.Random(1), 40):
+        check_moves(game, "orange" if color == "blue" else "blue")
+
+
+def test_pawn_index():
+    """Les pions sont retrouvés par (couleur, type) et par case sans parcourir la liste"""
+    game = make_game(2)
+    for pawn in game.pawns:
+        assert game.get_pawn(pawn.color, pawn.type) is pawn
+        assert game.pawns_at(pawn.x, pawn.y) == [pawn]
+    dog = game.get_pawn("orange", 3)
+    cat = game.get_pawn("blue", 2)
+    game.grid.board.move(dog.slot, 2, 2)
+    game.grid.board.move(cat.slot, 2, 2)
+    assert game.pawns_at(2, 2) == [dog, cat]
+    assert game.get_color_bottom(2, 2, 3) == "orange"
+    assert game.get_color_bottom(2, 2, 2) == "blue"
+    assert [pawn["type"] for pawn in game.grid.getfinalstack(2, 2)] == [3, 2]
+
+
+def test_zobrist_hash():
+    """Le hash incrémental est toujours égal au hash recalculé, et revient à sa valeur après undo_move"""
+    rng = random.Random(2)
+    for seed in range(5):
+        game = make_game(seed)
+        board = game.grid.board
+        assert game.position_hash() == board.compute_hash()
+        hashes = [game.position_hash()]
+        tokens = []
+        for _, _, token in random_playout(game, rng, 30):
+            tokens.append(token)
+            assert game.position_hash() == board.compute_hash()
+            assert game.position_hash() != hashes[-1]
+            hashes.append(game.position_hash())
+        while tokens:
+            hashes.pop()
+            game.undo_move(tokens.pop())
+            assert game.position_hash() == hashes[-1]
+
+    # Deux ordres de coups différents menant à la même position donnent le même hash
+    game = make_game(0)
+    blue = [move for move in game.all_next_moves("blue") if move[1] == 2][0]
+    orange = [move for move in game.all_next_moves("orange") if move[1] == 2][0]
+    game.apply_move(blue)
+    game.apply_move(orange)
+    first = game.position_hash()
+    game = make_game(0)
+    game.grid.board.set_side(1)
+    game.apply_move(orange)
+    game.apply_move(blue)
+    game.grid.board.set_side(0)
+    assert game.position_hash() == first
+
+
+def test_evaluation_tables():
+    """Les évaluations par table donnent le score des règles de chaque pile, pondéré par la case pour evaluateCenter"""
+    game = make_game(0)
+    board = game.grid.board
+    # Pile 4-3-2 au centre: âne orange, chien bleu, chat orange
+    board.move(game.get_pawn("orange", 4).slot, 2, 2)
+    board.move(game.get_pawn("blue", 3).slot, 2, 2)
+    board.move(game.get_pawn("orange", 2).slot, 2, 2)
+    colors = ["orange", "blue", "orange"]
+    for color in ("blue", "orange"):
+        classic = game.calculate_stack_scoreClassic((4, 3, 2), *colors, color, 2000, 500, 500)
+        center = game.calculate_stack_scoreCenter((4, 3, 2), *colors, color, 100, 50, 500)
+        assert game.evaluateClassic(color) == classic
+        assert game.evaluateCenter(color) == center * 1.5
+    assert game.evaluateRush("orange") == 6000 and game.evaluateRush("blue") == 0
+    assert game.evaluateBlock("blue") == 0
+
+    # Le coq bleu sur la pile 4-3-2 la rend gagnante pour l'orange
+    board.move(game.get_pawn("blue", 1).slot, 2, 2)
+    assert game.evaluateClassic("orange") == 100000000
+    assert game.evaluateClassic("blue") == -100000000
+    assert game.evaluateRush("orange") == 100000000
+
+
+def evaluations(game):
+    return [(game.evaluateClassic(color), game.evaluateCenter(color), game.evaluateRush(color),
+             game.evaluateBlock(color)) for color in ("blue", "orange")]
+
+
+def test_incremental_evaluation():
+    """Les sommes tenues à jour par le plateau sont égales au recalcul complet, après chaque coup et chaque undo_move"""
+    rng = random.Random(3)
+    for seed in range(5):
+        game = make_game(seed)
+        evaluations(game)  # les tables sont suivies dès la première évaluation
+        tokens = []
+        for _, _, token in random_playout(game, rng, 40, stacking=True):
+            tokens.append(token)
+            incremental = evaluations(game)
+            game.incremental_eval = False
+            assert incremental == evaluations(game)
+            game.incremental_eval = True
+        while tokens:
+            game.undo_move(tokens.pop())
+        incremental = evaluations(game)
+        game.incremental_eval = False
+        assert incremental == evaluations(game)
+
+
+def test_batch_evaluation():
+    """L'évaluation par lot donne les mêmes scores que les méthodes de Game, en cellules compactes ou en one-hot"""
+    from game.batch_eval import encode_games, evaluate_batch, pack_observations
+    rng = random.Random(4)
+    positions = []
+    expected = []
+    for seed in range(4):
+        game = make_game(seed)
+        # Chaque partie a ses propres pions en retraite: aucun état laissé par un autre test
+        assert game.pawns_must_play == {"orange": [], "blue": []}
+        for _ in random_playout(game, rng, 30, stacking=True):
+            positions.append(encode_games([game])[0])
+            observation = np.zeros((5, 5, 8), dtype=np.int8)
+            for pawn in game.pawns:
+                observation[pawn.y, pawn.x, pawn.slot] = 1
+            assert (pack_observations(observation[None])[0] == positions[-1]).all()
+            expected.append(evaluations(game))
+
+    for side, color in enumerate(("blue", "orange")):
+        scores = evaluate_batch(np.array(positions), color)
+        for name, index in (("classic", 0), ("center", 1), ("rush", 2), ("block", 3)):
+            assert list(scores[name]) == [evaluation[side][index] for evaluation in expected]
+
+
+def test_retreat_state_per_game():
+    """Les pions en retraite appartiennent à chaque partie et suivent la copie, apply_move et undo_move"""
+    game = make_game(0)
+    other = make_game(1)
+    # Position forcée: le coq orange est sur la ligne bleue et l'âne bleu arrive sur sa case, le coq doit jouer
+    rooster = game.get_pawn("orange", 1)
+    free = [x for x in range(5) if game.grid.board.top(x, 0) == 0][0]
+    game.grid.board.move(rooster.slot, free, 0)
+    token = game.apply_move(["blue", 4, free, 0])
+    assert game.pawns_must_play["orange"] == [rooster]
+    assert other.pawns_must_play == {"orange": [], "blue": []}
+    assert all(move[1] == 1 for move in game.all_next_moves("orange"))
+
+    copy = game.search_copy()
+    assert [pawn.type for pawn in copy.pawns_must_play["orange"]] == [1]
+    assert copy.pawns_must_play["orange"][0] is copy.get_pawn("orange", 1)
+    copy.pawns_must_play["orange"] = []
+    assert game.pawns_must_play["orange"] == [rooster]
+
+    game.undo_move(token)
+    assert game.pawns_must_play["orange"] == []
+    assert game.grid.board.retreat == 0
+
+
+def test_reset_in_place():
+    """reset garde les pions et la grille, vide la grille et les retraites et replace les pions au hasard"""
+    game = make_game(0)
+    pawns = list(game.pawns)
+    grid = game.grid
+    evaluations(game)
+    move = game.all_next_moves("blue")[0]
+    game.apply_move(move)
+    game.pawns_must_play["orange"] = [game.get_pawn("orange", 1)]
+    game.num_retreat = 3
+
+    np.random.seed(5)
+    game.reset()
+    assert game.pawns == pawns and game.grid is grid
+    assert game.pawns_must_play == {"orange": [], "blue": []} and game.num_retreat == 0
+    board = game.grid.board
+    assert board.retreat == 0 and board.hash == board.compute_hash()
+    for pawn in pawns:
+        assert board.stack(pawn.x, pawn.y) == (pawn.type,)
+        assert pawn.y == (0 if pawn.color == "blue" else 4)
+    assert sum(board.height(x, y) for x in range(5) for y in range(5)) == 8
+
+    # Même placement qu'une nouvelle partie créée avec la même graine
+    np.random.seed(5)
+    fresh = Game(NoRecord(), manual_mode=False, use_ai=True, ai_types=(1, 1))
+    assert fresh.grid.board.cells == board.cells
+    incremental = evaluations(game)
+    game.incremental_eval = False
+    assert incremental == evaluations(game)
@@ -0,0 +1,110 @@
+import sys
+import os
+import time
+import numpy as np
+
+# Ajouter le répertoire parent au chemin pour pouvoir importer les modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai.Minimax import Minimax
+from ai.transposition import TranspositionTable, EXACT, LOWER, UPPER
+from tests.test_game import make_game, play_random_moves
+
+
+def test_transposition_table_replacement():
+    """Une entrée profonde n'est pas remplacée par une entrée moins profonde du même bucket"""
+    tt = TranspositionTable(max_mb=0.001)
+    first = 5
+    second = first + tt.size  # même bucket
+    tt.store(first, 4, EXACT, 10, ("blue", 1, 2, 2))
+    tt.store(second, 1, LOWER, 3, None)
+    assert tt.probe(first)[3] == 10
+    assert tt.probe(second)[3] == 3
+    assert tt.probe(first + 2 * tt.size) is None
+    stats = tt.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["entries"] == 2
+
+    tt = TranspositionTable(max_mb=0.001, replacement="always")
+    second = first + tt.size
+    tt.store(first, 4, EXACT, 10, None)
+    tt.store(second, 1, UPPER, 3, None)
+    assert tt.probe(first) is None
+    assert tt.probe(second)[2] == UPPER
+
+
+def test_minimax_transposition_same_score():
+    """La table de transposition ne change pas le score du meilleur coup"""
+    for seed in range(4):
+        scores = []
+        for tt_size_mb in (0, 4):
+            game = make_game(seed)
+            color = play_random_moves(game, 16, seed)
+            ai = Minimax(color, game, tt_size_mb=tt_size_mb)
+            ai.base_depth = 4
+            ai.playsmart()
+            scores.append(max(ai.moves_scores.values()))
+        assert scores[0] == scores[1]
+        assert ai.tt.stats()["stores"] > 0
+
+
+def test_iterative_deepening_budget():
+    """Avec un budget, la recherche s'approfondit et rend toujours un coup valide"""
+    game = make_game(1)
+    color = play_random_moves(game, 12, 1)
+    legal_moves = game.all_next_moves(color)
+
+    ai = Minimax(color, game, node_budget=2000)
+    move = ai.playsmart()
+    assert move in legal_moves
+    assert ai.last_depth >= 1
+    assert ai.nodes <= 2001
+
+    ai = Minimax(color, game)
+    start = time.monotonic()
+    move = ai.playsmart(time_budget=0.2)
+    assert time.monotonic() - start < 2
+    assert move in legal_moves
+
+    # Sans limite, la dernière profondeur donne le même score qu'une recherche directe
+    fixed = Minimax(color, game)
+    fixed.playsmart()
+    deepening = Minimax(color, game, node_budget=10 ** 9, max_depth=fixed.base_depth)
+    deepening.playsmart()
+    assert deepening.last_depth == fixed.base_depth
+    assert max(deepening.moves_scores.values()) == max(fixed.moves_scores.values())
+
+
+def test_move_ordering():
+    """Les coups qui prolongent la pile 4-3-2 passent en premier, puis les autres empilements et les coups tueurs"""
+    game = make_game(0)
+    board = game.grid.board
+    # Pile 4-3 en (1, 2): le chat bleu la prolonge, le coq bleu s'empile simplement dessus
+    board.move(game.get_pawn("orange", 4).slot, 1, 2)
+    board.move(game.get_pawn("blue", 3).slot, 1, 2)
+    ai = Minimax("blue", game)
+    cells = board.cells
+    killer = ["blue", 1, 4, 4]
+    chain = ai.move_order(cells, ["blue", 2, 1, 2], [killer])
+    stack = ai.move_order(cells, ["blue", 1, 1, 2], [killer])
+    assert chain > stack > ai.move_order(cells, killer, [killer]) > ai.move_order(cells, ["blue", 1, 3, 3], [killer])
+
+    ai.playsmart()
+    assert ai.nodes > 0
+    assert all(len(killers) <= 2 for killers in ai.killers.values())
+
+
+def test_parallel_search_same_score():
+    """La recherche répartie sur plusieurs processus trouve le même meilleur score que la recherche séquentielle"""
+    for seed in range(2):
+        game = make_game(seed)
+        color = play_random_moves(game, 10, seed)
+        serial = Minimax(color, game)
+        serial.playsmart()
+        parallel = Minimax(color, game, workers=2)
+        try:
+            move = parallel.playsmart()
+        finally:
+            parallel.close()
+        assert max(parallel.moves_scores.values()) == max(serial.moves_scores.values())
+        assert set(parallel.moves_scores) == set(serial.moves_scores)
+        assert move in game.all_next_moves(color)
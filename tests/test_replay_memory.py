@@ -0,0 +1,75 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Ajouter le répertoire parent au chemin pour pouvoir importer les modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from train.replay_memory import ReplayMemory
+
+
+def transition(i):
+    """Transition numéro i: l'état est rempli de i, l'état suivant de i + 1"""
+    return np.full((5, 5, 8), i, dtype=np.int8), i, float(i) / 2, np.full((5, 5, 8), i + 1, dtype=np.int8), i % 3 == 0
+
+
+def test_replay_memory():
+    """La mémoire garde les dernières transitions et les tire en lots cohérents"""
+    memory = ReplayMemory(4, (5, 5, 8))
+    for i in range(6):
+        memory.append(*transition(i))
+    # Les deux premières transitions ont été remplacées
+    assert len(memory) == 4
+    assert memory.cursor == 2
+    assert sorted(memory.actions) == [2, 3, 4, 5]
+
+    # Un lot qui fait le tour de la mémoire
+    batch = [transition(i) for i in (6, 7, 8)]
+    memory.extend(*[np.array(column) for column in zip(*batch)])
+    assert len(memory) == 4
+    assert memory.cursor == 1
+    assert sorted(memory.actions) == [5, 6, 7, 8]
+
+    states, actions, rewards, next_states, dones = memory.sample(32)
+    assert states.shape == next_states.shape == (32, 5, 5, 8)
+    assert states.dtype == np.int8
+    assert set(actions) <= {5, 6, 7, 8}
+    # Chaque élément du lot vient de la même transition
+    assert (states[:, 0, 0, 0] == actions).all()
+    assert (next_states[:, 0, 0, 0] == actions + 1).all()
+    assert np.allclose(rewards, actions / 2)
+    assert (dones == (actions % 3 == 0)).all()
+
+
+def test_dqn_batched_replay():
+    """La mise à jour par lot donne la même erreur et les mêmes poids avec train_on_batch et avec le pas compilé"""
+    pytest.importorskip("tensorflow")
+    pytest.importorskip("matplotlib")
+    from train.train_dqn import DQNAgent
+
+    agents = [DQNAgent((5, 5, 8), 4, memory_size=64, compiled_train_step=compiled) for compiled in (False, True)]
+    agents[1].model.set_weights(agents[0].model.get_weights())
+    agents[1].update_target_model()
+    initial_weights = agents[0].model.get_weights()
+    for agent in agents:
+        for i in range(16):
+            state, _, reward, next_state, done = transition(i)
+            agent.remember(state, i % 4, reward, next_state, done)
+
+    weights = []
+    losses = []
+    for agent in agents:
+        # Même mini-batch pour les deux agents
+        np.random.seed(0)
+        losses.append(agent.replay(8))
+        assert agent.epsilon < 1.0
+        weights.append(agent.model.get_weights())
+
+    # Même erreur: la moyenne sur toutes les actions minimisée par train_on_batch
+    assert losses[0] > 0 and np.isclose(losses[0], losses[1], rtol=1e-4)
+
+    assert any(not np.allclose(before, after) for before, after in zip(initial_weights, weights[0]))
+    for batched, compiled in zip(*weights):
+        assert np.allclose(batched, compiled, atol=1e-5)
@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class ReplayMemory:
+    """Mémoire de rejeu circulaire de l'agent DQN, dans des tableaux NumPy alloués une fois pour toutes
+
+    Les transitions sont écrites à la position du curseur, qui revient au début une fois la capacité atteinte:
+    les plus anciennes transitions sont alors remplacées. La mémoire occupée ne dépend que de la capacité
+    (environ 2 * 200 octets par transition pour des états (5, 5, 8) en int8).
+    """
+
+    def __init__(self, capacity, state_shape, state_dtype=np.int8):
+        """
+        Args:
+            capacity (int): nombre maximal de transitions gardées
+            state_shape (tuple): forme d'un état
+            state_dtype: type des états (les observations de TacticiensEnv sont en int8)
+        """
+        self.capacity = capacity
+        self.states = np.zeros((capacity,) + tuple(state_shape), dtype=state_dtype)
+        self.actions = np.zeros(capacity, dtype=np.int32)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity,) + tuple(state_shape), dtype=state_dtype)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.cursor = 0  # Position de la prochaine transition écrite
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, state, action, reward, next_state, done):
+        """Ajoute une transition"""
+        i = self.cursor
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.cursor = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def extend(self, states, actions, rewards, next_states, dones):
+        """Ajoute un lot de transitions, e.g. un pas de TacticiensVectorEnv"""
+        count = len(actions)
+        indices = (self.cursor + np.arange(count)) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+        self.dones[indices] = dones
+        self.cursor = int((self.cursor + count) % self.capacity)
+        self.size = min(self.size + count, self.capacity)
+
+    def sample(self, batch_size):
+        """
+        Tire batch_size transitions au hasard (avec remise) parmi celles gardées.
+
+        Returns:
+            states (np.ndarray): (batch_size,) + state_shape
+            actions (np.ndarray): (batch_size,)
+            rewards (np.ndarray): (batch_size,)
+            next_states (np.ndarray): (batch_size,) + state_shape
+            dones (np.ndarray): (batch_size,)
+        """
+        indices = np.random.randint(0, self.size, size=batch_size)
+        return (self.states[indices], self.actions[indices], self.rewards[indices], self.next_states[indices],
+                self.dones[indices])
@@ -7,26 +7,27 @@ import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Flatten, Conv2D
 from tensorflow.keras.optimizers import Adam
-from collections import deque
-import random
 import matplotlib.pyplot as plt
 
 # Ajouter le répertoire parent au chemin pour pouvoir importer les modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from gym_env.tacticiens_env import TacticiensEnv
+from train.replay_memory import ReplayMemory
 
 # Classe pour l'agent DQN
 class DQNAgent:
-    def __init__(self, state_shape, action_size):
+    def __init__(self, state_shape, action_size, memory_size=10000, compiled_train_step=False):
         self.state_shape = state_shape
         self.action_size = action_size
-        self.memory = deque(maxlen=10000)
+        self.memory = ReplayMemory(memory_size, state_shape)
         self.gamma = 0.95    # facteur d'actualisation
         self.epsilon = 1.0   # taux d'exploration initial
         self.epsilon_min = 0.01  # taux d'exploration minimal
         self.epsilon_decay = 0.995  # taux de décroissance de l'exploration
         self.learning_rate = 0.001  # taux d'apprentissage
+        # True pour entraîner avec _train_step, compilé par tf.function, plutôt qu'avec train_on_batch
+        self.compiled_train_step = compiled_train_step
         self.model = self._build_model()
         self.target_model = self._build_model()
         self.update_target_model()
@@ -48,7 +49,7 @@ class DQNAgent:
 
     def remember(self, state, action, reward, next_state, done):
         # Stocker l'expérience dans la mémoire
-        self.memory.append((state, action, reward, next_state, done))
+        self.memory.append(state, action, reward, next_state, done)
 
     def act(self, state, valid_moves):
         # Choisir une action selon la politique epsilon-greedy
@@ -70,27 +71,48 @@ class DQNAgent:
         return max(valid_q_values, key=lambda x: x[1])[0]
 
     def replay(self, batch_size):
-        # Entraîner le modèle sur un mini-batch d'expériences
+        # Entraîner le modèle sur un mini-batch d'expériences, retourne l'erreur du mini-batch avant la mise à jour
         if len(self.memory) < batch_size:
-            return
+            return None
 
-        minibatch = random.sample(self.memory, batch_size)
-        for state, action, reward, next_state, done in minibatch:
-            target = reward
-            if not done:
-                # Utiliser le modèle cible pour calculer la valeur Q future
-                target = reward + self.gamma * np.amax(self.target_model.predict(np.expand_dims(next_state, axis=0), verbose=0)[0])
+        states, actions, rewards, next_states, dones = self.memory.sample(batch_size)
+        states = states.astype(np.float32)
+        next_states = next_states.astype(np.float32)
+        dones = dones.astype(np.float32)
 
-            # Mettre à jour la valeur Q pour l'action choisie
-            target_f = self.model.predict(np.expand_dims(state, axis=0), verbose=0)
-            target_f[0][action] = target
+        if self.compiled_train_step:
+            loss = float(self._train_step(states, actions, rewards, next_states, dones))
+        else:
+            # Valeurs Q futures de tout le mini-batch en un seul passage du modèle cible
+            next_q_values = self.target_model(next_states, training=False).numpy()
+            targets = rewards + self.gamma * np.amax(next_q_values, axis=1) * (1 - dones)
 
-            # Entraîner le modèle
-            self.model.fit(np.expand_dims(state, axis=0), target_f, epochs=1, verbose=0)
+            # Mettre à jour la valeur Q de l'action choisie dans chaque transition
+            target_f = self.model(states, training=False).numpy()
+            target_f[np.arange(batch_size), actions] = targets
+
+            # Entraîner le modèle sur tout le mini-batch
+            loss = float(np.squeeze(self.model.train_on_batch(states, target_f)))
 
         # Réduire epsilon pour diminuer l'exploration au fil du temps
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
+        return loss
+
+    @tf.function
+    def _train_step(self, states, actions, rewards, next_states, dones):
+        # Même mise à jour que train_on_batch dans replay, en un seul graphe TensorFlow
+        next_q_values = self.target_model(next_states, training=False)
+        targets = rewards + self.gamma * tf.reduce_max(next_q_values, axis=1) * (1 - dones)
+        with tf.GradientTape() as tape:
+            q_values = self.model(states, training=True)
+            q_actions = tf.gather(q_values, actions, batch_dims=1)
+            # L'erreur quadratique moyenne de train_on_batch porte sur toutes les actions, dont seule celle choisie
+            # a une cible différente de la prédiction
+            loss = tf.reduce_mean(tf.square(targets - q_actions)) / self.action_size
+        gradients = tape.gradient(loss, self.model.trainable_variables)
+        self.model.optimizer.apply_gradients(zip(gradients, self.model.trainable_variables))
+        return loss
 
     def load(self, name):
         self.model.load_weights(name)